@@ -1,7 +1,16 @@
 import firebase_admin
 from firebase_admin import auth, credentials, firestore
 import argparse
+import csv
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+VALID_ROLES = ('user', 'admin', 'superadmin')
+# Limite de escritas por lote do Firestore.
+FIRESTORE_BATCH_LIMIT = 500
+
 
 def init_admin(service_account_path):
     cred = credentials.Certificate(service_account_path)
@@ -14,6 +23,8 @@ def init_admin(service_account_path):
 
 def create_user(email, password, display_name=None):
     user = auth.create_user(email=email, password=password, display_name=display_name)
+    # A role também vai como custom claim, para o app ler do token no login sem consultar o Firestore.
+    auth.set_custom_user_claims(user.uid, {'role': 'user'})
     db = firestore.client()
     db.collection('users').document(user.uid).set({
         'email': email,
@@ -31,11 +42,151 @@ def set_role(uid, role):
     db.collection('users').document(uid).update({'role': role})
 
 
+class RateLimiter:
+    # Token bucket simples compartilhado pelas threads: no máximo `rate` chamadas por segundo à API do Auth.
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def write_profiles(db, profiles):
+    # profiles: [(uid, dados)]; merge=True torna a escrita idempotente e preserva campos que já existiam.
+    # Devolve, para cada perfil, None ou o erro do lote em que ele estava: um lote que falha não desfaz os outros.
+    errors = []
+    for start in range(0, len(profiles), FIRESTORE_BATCH_LIMIT):
+        chunk = profiles[start:start + FIRESTORE_BATCH_LIMIT]
+        batch = db.batch()
+        for uid, data in chunk:
+            batch.set(db.collection('users').document(uid), data, merge=True)
+        try:
+            batch.commit()
+            errors.extend([None] * len(chunk))
+        except Exception as e:
+            errors.extend([e] * len(chunk))
+    return errors
+
+
+def _provision_user(row, limiter):
+    email = (row.get('email') or '').strip()
+    password = row.get('password') or ''
+    display_name = (row.get('display_name') or '').strip()
+    role = (row.get('role') or '').strip()
+    if not email:
+        raise ValueError('email é obrigatório')
+    if role and role not in VALID_ROLES:
+        raise ValueError(f"role inválida: '{role}'")
+    limiter.wait()
+    try:
+        user = auth.create_user(email=email, password=password, display_name=display_name or None)
+        status = 'criado'
+    except auth.EmailAlreadyExistsError:
+        # Reexecução: o usuário já existe, então só aplicamos o que o CSV informa; role e nome vazios não
+        # rebaixam um admin para 'user' nem apagam o nome já cadastrado.
+        limiter.wait()
+        user = auth.get_user_by_email(email)
+        status = 'existente'
+    profile = {'email': email}
+    if status == 'criado':
+        role = role or 'user'
+        profile['created_at'] = firestore.SERVER_TIMESTAMP
+        profile['display_name'] = display_name
+    elif display_name:
+        profile['display_name'] = display_name
+    if role:
+        limiter.wait()
+        auth.set_custom_user_claims(user.uid, {'role': role})
+        profile['role'] = role
+    return user.uid, status, profile
+
+
+def _resolve_role_row(row, limiter):
+    uid = (row.get('uid') or '').strip()
+    email = (row.get('email') or '').strip()
+    role = (row.get('role') or '').strip()
+    if role not in VALID_ROLES:
+        raise ValueError(f"role inválida: '{role}'")
+    if not uid:
+        if not email:
+            raise ValueError('informe uid ou email')
+        limiter.wait()
+        uid = auth.get_user_by_email(email).uid
+    limiter.wait()
+    auth.set_custom_user_claims(uid, {'role': role})
+    return uid, 'atualizado', {'role': role}
+
+
+def _run_bulk(path, worker, workers, rate):
+    limiter = RateLimiter(rate)
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        rows = list(csv.DictReader(f))
+
+    def run(row):
+        try:
+            return worker(row, limiter)
+        except Exception as e:
+            return None, 'erro', str(e)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = list(pool.map(run, rows))
+
+    report = []
+    profiles = []
+    profiled = []
+    for line, (row, (uid, status, detail)) in enumerate(zip(rows, outcomes), start=2):
+        entry = {'linha': line, 'email': row.get('email', ''), 'uid': uid or row.get('uid', ''),
+                 'status': status, 'mensagem': detail if status == 'erro' else ''}
+        report.append(entry)
+        if status != 'erro':
+            profiles.append((uid, detail))
+            profiled.append(entry)
+    # Os perfis vão em lotes depois das chamadas ao Auth; só as linhas de um lote que falhou viram erro, e basta
+    # rodar de novo para gravá-las.
+    try:
+        errors = write_profiles(firestore.client(), profiles)
+    except Exception as e:
+        errors = [e] * len(profiles)
+    for entry, error in zip(profiled, errors):
+        if error is not None:
+            entry['mensagem'] = f"perfil não gravado (conta: {entry['status']}): {error}"
+            entry['status'] = 'erro'
+    return report
+
+
+def import_users(path, workers=8, rate=10):
+    # Idempotente: emails já cadastrados viram 'existente' e só recebem a role e o nome que vierem preenchidos.
+    return _run_bulk(path, _provision_user, workers, rate)
+
+
+def set_roles(path, workers=8, rate=10):
+    return _run_bulk(path, _resolve_role_row, workers, rate)
+
+
+def write_report(report, path):
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=['linha', 'email', 'uid', 'status', 'mensagem'])
+        writer.writeheader()
+        writer.writerows(report)
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Ferramentas de admin para o app ToDo com Firebase.")
     parser.add_argument('--service-account', required=True, help='Caminho para o arquivo serviceAccountKey.json')
     parser.add_argument('--create-user', nargs=3, metavar=('email','senha','nome'), help='Cria um novo usuário com perfil no Firestore.')
     parser.add_argument('--set-role', nargs=2, metavar=('uid','role'), help='Define uma role (user, admin, superadmin) para um usuário.')
+    parser.add_argument('--import-users', metavar='usuarios.csv', help='Cria em massa os usuários de um CSV (colunas: email, password, display_name, role).')
+    parser.add_argument('--set-roles', metavar='roles.csv', help='Define em massa as roles de um CSV (colunas: uid ou email, role).')
+    parser.add_argument('--workers', type=int, default=8, help='Threads usadas nas operações em massa (padrão: 8).')
+    parser.add_argument('--rate', type=float, default=10, help='Máximo de chamadas por segundo à API do Auth (padrão: 10).')
+    parser.add_argument('--report', help='Arquivo CSV com o resultado de cada linha (padrão: <entrada>.report.csv).')
     args = parser.parse_args()
 
     if not os.path.exists(args.service_account):
@@ -61,4 +212,22 @@ if __name__ == '__main__':
             set_role(uid, role)
             print(f"\nRole '{role}' definida com sucesso para o UID: {uid}")
         except Exception as e:
-            print(f"\nERRO ao definir a role: {e}")
\ No newline at end of file
+            print(f"\nERRO ao definir a role: {e}")
+
+    for bulk_path, bulk_fn in ((args.import_users, import_users), (args.set_roles, set_roles)):
+        if not bulk_path:
+            continue
+        started = time.time()
+        try:
+            report = bulk_fn(bulk_path, args.workers, args.rate)
+        except Exception as e:
+            print(f"\nERRO ao processar '{bulk_path}': {e}")
+            continue
+        report_path = args.report or bulk_path + '.report.csv'
+        write_report(report, report_path)
+        counts = {}
+        for r in report:
+            counts[r['status']] = counts.get(r['status'], 0) + 1
+        resumo = ', '.join(f"{n} {status}" for status, n in sorted(counts.items()))
+        print(f"\n'{bulk_path}' processado em {time.time() - started:.1f} s: {resumo}.")
+        print(f"  Relatório: {report_path}")
\ No newline at end of file
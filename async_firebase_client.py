@@ -0,0 +1,277 @@
+import asyncio
+import json
+import time
+
+import aiohttp
+
+from firebase_client import (FirebaseRestBase, IDENTITY_TOOLKIT_URL, SECURE_TOKEN_URL, FIRESTORE_URL,
+                             TOMBSTONE_COLLECTION, DELTA_OVERLAP, BATCH_GET_LIMIT)
+from resilience import AsyncConcurrencyLimiter, THROTTLE_STATUS, retry_after
+
+
+class AsyncFirebaseClient(FirebaseRestBase):
+    def __init__(self, api_key, project_id, identity_url=IDENTITY_TOOLKIT_URL,
+                 secure_token_url=SECURE_TOKEN_URL, firestore_url=FIRESTORE_URL,
+                 max_concurrency=50, pool_size=100, timeout=30, retry=None, breaker=None, metrics=None):
+        super().__init__(api_key, project_id, identity_url, secure_token_url, firestore_url, retry, breaker, metrics)
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.session = None
+        self.limiter = None
+        self.refresh_lock = None
+
+    async def __aenter__(self):
+        await self._ensure_session()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _ensure_session(self):
+        # A sessão e o limitador precisam ser criados dentro do event loop que vai usá-los.
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.pool_size)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self.limiter = AsyncConcurrencyLimiter(self.max_concurrency)
+            self.refresh_lock = asyncio.Lock()
+        return self.session
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _request(self, method, url, idempotent=None, operation=None, **kwargs):
+        operation = operation or self._operation_name(method, url)
+        # O corpo JSON é serializado aqui para as métricas saberem o tamanho enviado.
+        if 'json' in kwargs:
+            kwargs['data'] = json.dumps(kwargs.pop('json')).encode('utf-8')
+            kwargs['headers'] = {**kwargs.get('headers', {}), 'Content-Type': 'application/json'}
+        body = kwargs.get('data')
+        request_bytes = len(body) if isinstance(body, (bytes, str)) else 0
+        started = time.perf_counter()
+        try:
+            status, data, response_bytes, retries = await self._send(method, url, self._is_idempotent(method, idempotent),
+                                                                     **kwargs)
+        except Exception as e:
+            self.metrics.record(operation, None, time.perf_counter() - started, error=type(e).__name__)
+            raise
+        self.metrics.record(operation, status, time.perf_counter() - started, request_bytes, response_bytes, retries)
+        return status, data
+
+    async def _send(self, method, url, idempotent, **kwargs):
+        session = await self._ensure_session()
+        attempt = 0
+        while True:
+            self.breaker.before_request()
+            try:
+                await self.limiter.acquire()
+            except BaseException:
+                self.breaker.abandon()
+                raise
+            status = None
+            try:
+                async with session.request(method, url, **kwargs) as r:
+                    status = r.status
+                    retry = self.retry.should_retry(attempt, status, idempotent)
+                    if retry:
+                        delay = self.retry.delay(attempt, retry_after(r.headers))
+                    else:
+                        raw = await r.read()
+                        data = json.loads(raw) if raw.strip() else None
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                self.breaker.record(None)
+                if not self.retry.should_retry(attempt, None, idempotent or isinstance(e, aiohttp.ClientConnectorError)):
+                    raise
+                delay = self.retry.delay(attempt)
+            except Exception:
+                # Corpo inválido (ex.: página HTML num 502), ClientPayloadError...: a tentativa também fecha a conta
+                # no circuito, senão uma requisição de teste o deixaria meio aberto para sempre.
+                self.breaker.record(status)
+                raise
+            except BaseException:
+                # Cancelamento: não diz nada sobre o servidor, só libera a vaga de teste.
+                self.breaker.abandon()
+                raise
+            else:
+                self.breaker.record(status)
+                if not retry:
+                    return status, data, len(raw), attempt
+            finally:
+                await self.limiter.release(status in THROTTLE_STATUS)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _authorized_request(self, method, url, idempotent=None, operation=None, **kwargs):
+        # Sem timer em segundo plano: antes de cada chamada o token é renovado se estiver perto de expirar.
+        await self._ensure_session()
+        if self._token_needs_refresh():
+            await self._refresh_if_current(self.id_token)
+        token = self.id_token
+        status, data = await self._request(method, url, idempotent, operation, headers=self._auth_headers(), **kwargs)
+        if self._is_unauthenticated(status) and self.refresh_token:
+            await self._refresh_if_current(token)
+            status, data = await self._request(method, url, idempotent, operation, headers=self._auth_headers(), **kwargs)
+        return status, data
+
+    async def _refresh_if_current(self, stale_token):
+        async with self.refresh_lock:
+            if self.id_token != stale_token:
+                return None
+            return await self.refresh_id_token()
+
+    async def sign_up(self, email, password):
+        payload = {"email": email, "password": password, "returnSecureToken": True}
+        _, data = await self._request('POST', self._sign_up_url(), json=payload)
+        return data
+
+    async def sign_in(self, email, password):
+        payload = {"email": email, "password": password, "returnSecureToken": True}
+        _, data = await self._request('POST', self._sign_in_url(), idempotent=True, json=payload)
+        self._store_sign_in(data)
+        return data
+
+    async def refresh_id_token(self):
+        payload = {"grant_type": "refresh_token", "refresh_token": self.refresh_token}
+        _, data = await self._request('POST', self._refresh_url(), idempotent=True, data=payload)
+        self._store_refresh(data)
+        return data
+
+    async def create_task(self, user_id, doc, doc_id=None):
+        chunk, body = next(self._batch_chunks([self._new_task_op(user_id, doc, doc_id)]))
+        status, data = await self._authorized_request('POST', self._base_url() + ":commit", operation='create_task',
+                                                      json=body)
+        return self._written_task(chunk, data, status)
+
+    async def iter_task_pages(self, user_id, page_size=500, fields=None):
+        url = self._base_url() + ":runQuery"
+        cursor = None
+        while True:
+            _, res = await self._authorized_request('POST', url, idempotent=True, operation='list_tasks',
+                                                    json=self._tasks_query(user_id, page_size, cursor, fields))
+            docs = self._query_documents(res)
+            if docs:
+                yield self._decode_tasks(docs)
+            if len(docs) < page_size:
+                return
+            cursor = self._next_cursor(docs)
+
+    async def _query_changes(self, collection, user_id, since, page_size, fields=None):
+        url = self._base_url() + ":runQuery"
+        cursor = None
+        results = []
+        while True:
+            _, res = await self._authorized_request(
+                'POST', url, idempotent=True, operation=f'list_changes {collection}',
+                json=self._changes_query(collection, user_id, since, page_size, cursor, fields))
+            docs = self._query_documents(res)
+            results.extend(self._decode_tasks(docs))
+            if len(docs) < page_size:
+                return results
+            cursor = self._next_cursor(docs, 'updated_at')
+
+    async def list_tasks_changed_since(self, user_id, watermark, fields=None, page_size=500):
+        since = max(watermark - DELTA_OVERLAP, 0)
+        tasks, tombstones = await asyncio.gather(
+            self._query_changes('tarefas', user_id, since, page_size, fields),
+            self._query_changes(TOMBSTONE_COLLECTION, user_id, since, page_size))
+        return self._merge_changes(tasks, tombstones, watermark)
+
+    async def run_task_query(self, query, cursor=None, page_size=500):
+        url = self._base_url() + ":runQuery"
+        segments = query.segments()
+        wanted = query.max_results or page_size
+        index, after = cursor or (0, None)
+        tasks = []
+        while index < len(segments) and len(tasks) < wanted:
+            segment = segments[index]
+            limit = wanted - len(tasks)
+            _, res = await self._authorized_request('POST', url, idempotent=True, operation='query_tasks',
+                                                    json=segment.to_structured_query(limit, after))
+            docs = self._query_documents(res)
+            tasks.extend(self._decode_tasks(docs))
+            if len(docs) < limit:
+                index, after = index + 1, None
+            else:
+                after = self._next_cursor(docs, *(f for f, _ in segment.order_fields()))
+        return tasks, ((index, after) if index < len(segments) else None)
+
+    async def iter_tasks(self, user_id, page_size=500, fields=None):
+        async for page in self.iter_task_pages(user_id, page_size, fields):
+            for task in page:
+                yield task
+
+    async def list_tasks(self, user_id, fields=None):
+        return [task async for task in self.iter_tasks(user_id, fields=fields)]
+
+    async def get_tasks(self, doc_ids, fields=None):
+        url = self._base_url() + ":batchGet"
+        chunks = [doc_ids[start:start + BATCH_GET_LIMIT] for start in range(0, len(doc_ids), BATCH_GET_LIMIT)]
+        responses = await asyncio.gather(*(
+            self._authorized_request('POST', url, idempotent=True, operation='get_tasks',
+                                     json=self._batch_get_body(chunk, fields))
+            for chunk in chunks))
+        return [task for _, res in responses for task in self._decode_tasks(self._found_documents(res))]
+
+    async def get_task(self, doc_id):
+        _, data = await self._authorized_request('GET', self._base_url() + f"/tarefas/{doc_id}")
+        return self._decode_task(data) if 'name' in data else data
+
+    async def update_task(self, doc_id, updates: dict):
+        chunk, body = next(self._batch_chunks([{'op': 'update', 'id': doc_id, 'fields': updates}]))
+        status, data = await self._authorized_request('POST', self._base_url() + ":commit", idempotent=True,
+                                                      operation='update_task', json=body)
+        return self._written_task(chunk, data, status)
+
+    async def delete_task(self, doc_id):
+        _, body = next(self._batch_chunks([{'op': 'delete', 'id': doc_id}]))
+        status, _ = await self._authorized_request('POST', self._base_url() + ":commit", idempotent=True, json=body)
+        return status
+
+    async def batch_write(self, ops, atomic=False):
+        endpoint = ":commit" if atomic else ":batchWrite"
+
+        async def send(chunk, body):
+            status, data = await self._authorized_request('POST', self._base_url() + endpoint,
+                                                          self._batch_idempotent(chunk, atomic), json=body)
+            return self._batch_results(chunk, data, status)
+
+        chunk_results = await asyncio.gather(*(send(chunk, body) for chunk, body in self._batch_chunks(ops)))
+        return [res for results in chunk_results for res in results]
+
+    async def bulk_update_tasks(self, doc_ids, updates: dict):
+        return await self.batch_write([{'op': 'update', 'id': doc_id, 'fields': updates} for doc_id in doc_ids])
+
+    async def bulk_delete_tasks(self, doc_ids):
+        return await self.batch_write([{'op': 'delete', 'id': doc_id} for doc_id in doc_ids])
+
+    async def aggregate_tasks(self, user_id=None, filters=None, aggregations=None):
+        aggregations = aggregations or {'count': ('count', None)}
+        url = self._base_url() + ":runAggregationQuery"
+        _, res = await self._authorized_request('POST', url, idempotent=True,
+                                                json=self._aggregation_query(user_id, filters, aggregations))
+        return self._aggregation_result(res)
+
+    async def count_tasks(self, user_id=None, filters=None):
+        return (await self.aggregate_tasks(user_id, filters)).get('count', 0)
+
+    async def count_tasks_by(self, user_id, groups, filters=None):
+        keys = self._count_groups(groups)
+        counts = await asyncio.gather(*(self.count_tasks(user_id, self._group_filters(filters, *key)) for key in keys))
+        return self._group_counts(keys, counts)
+
+    async def get_user_profile(self, user_id, refresh=False):
+        if not refresh and self._cached_profile(user_id) is not None:
+            return self._cached_profile(user_id)
+        url = self._base_url() + f"/users/{user_id}"
+        status, data = await self._authorized_request('GET', url)
+        if status == 200:
+            return self._store_profile(user_id, self._from_firestore_fields(data.get('fields', {})))
+        return None
+
+    async def get_user_role(self, user_id):
+        if user_id == self.local_id and self.role:
+            return self.role
+        profile = await self.get_user_profile(user_id)
+        return profile.get('role') if profile else None
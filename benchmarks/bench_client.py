@@ -0,0 +1,262 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_firebase import FakeFirebaseServer, user_id_for
+from exporter import iter_export, task_pages
+from firebase_client import FirebaseClient, TASK_SUMMARY_FIELDS
+from search_index import TaskSearchIndex, RESULT_LIMIT
+
+# Benchmarks de ponta a ponta do FirebaseClient contra o servidor local de fake_firebase.py. Cada cenário grava
+# tempo (melhor de N execuções), vazão, percentis de latência por chamada e pico de memória Python (tracemalloc,
+# numa execução extra para não distorcer o tempo). O servidor roda no mesmo processo: o pico inclui o que ele
+# aloca para montar as respostas.
+
+EMAIL = 'bench@example.com'
+SEARCH_QUERIES = ['relatorio', 'tarefa 12', 'revisar 5', 'acentuacao', 'xyz', 'rel']
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    cuts = statistics.quantiles(ordered, n=100, method='inclusive') if len(ordered) > 1 else ordered * 99
+    return {'p50': round(cuts[49] * 1000, 2), 'p95': round(cuts[94] * 1000, 2),
+            'p99': round(cuts[98] * 1000, 2), 'max': round(ordered[-1] * 1000, 2)}
+
+
+def peak_memory_mb(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return round(tracemalloc.get_traced_memory()[1] / 1e6, 2)
+    finally:
+        tracemalloc.stop()
+
+
+def measure(name, fn, repeat, units, unit, params):
+    # fn() devolve a lista de latências das chamadas individuais daquela execução.
+    runs, samples = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        samples = fn()
+        runs.append(time.perf_counter() - start)
+    best = min(runs)
+    result = {
+        'name': name,
+        'params': params,
+        'wall_s': round(best, 4),
+        'runs_s': [round(r, 4) for r in runs],
+        'throughput': {'value': round(units / best, 1) if best else None, 'unit': unit},
+        'latency_ms': percentiles(samples),
+        'peak_memory_mb': peak_memory_mb(fn),
+    }
+    print(f"{name:<28}{json.dumps(params, ensure_ascii=False):<44}{best:9.3f} s "
+          f"{result['throughput']['value']:>14,.1f} {unit}")
+    return result
+
+
+def new_client(server, **kwargs):
+    return FirebaseClient.for_emulator('bench-key', server.store.project_id, server.host, server.host, **kwargs)
+
+
+def signed_in_client(server, **kwargs):
+    client = new_client(server, **kwargs)
+    client.sign_in(EMAIL, 'senha')
+    return client
+
+
+def timed_pages(pages):
+    samples = []
+    start = time.perf_counter()
+    for _ in pages:
+        now = time.perf_counter()
+        samples.append(now - start)
+        start = now
+    return samples
+
+
+def bench_login(server, args):
+    client = new_client(server)
+
+    def run():
+        samples = []
+        for _ in range(args.logins):
+            start = time.perf_counter()
+            client.sign_in(EMAIL, 'senha')
+            samples.append(time.perf_counter() - start)
+        return samples
+
+    result = measure('login', run, args.repeat, args.logins, 'logins/s', {'calls': args.logins})
+    client.close()
+    return [result]
+
+
+def bench_list(server, args):
+    results = []
+    user_id = user_id_for(EMAIL)
+    for size in args.sizes:
+        server.store.clear()
+        server.store.seed_tasks(user_id, size, args.description_size)
+        client = signed_in_client(server)
+        for label, fields in [('list summary', TASK_SUMMARY_FIELDS), ('list full', None)]:
+            run = lambda: timed_pages(client.iter_task_pages(user_id, args.page_size, fields))
+            results.append(measure(label, run, args.repeat, size, 'docs/s',
+                                   {'tasks': size, 'page_size': args.page_size}))
+        client.close()
+    return results
+
+
+def bench_bulk(server, args):
+    server.store.clear()
+    client = signed_in_client(server)
+    ids = [f"bulk{i:08d}" for i in range(args.bulk)]
+    params = {'writes': args.bulk}
+    base = {'titulo': 'Tarefa em lote', 'descricao': '', 'status': 'pendente', 'prioridade': 'baixa',
+            'due_date': '', 'user_id': client.local_id, 'created_at': int(time.time())}
+
+    calls = []
+    client.metrics.add_hook(lambda record: calls.append(record['latency_ms'] / 1000))
+
+    def timed(fn, *fn_args):
+        # Cada execução mede um lote completo; as latências são as das chamadas HTTP (1 por 500 escritas).
+        calls.clear()
+        fn(*fn_args)
+        return list(calls)
+
+    def create_all():
+        server.store.clear()
+        return timed(client.batch_write, [{'op': 'create', 'id': i, 'fields': base} for i in ids])
+
+    results = [measure('bulk create', create_all, args.repeat, args.bulk, 'writes/s', params)]
+    results.append(measure('bulk update', lambda: timed(client.bulk_update_tasks, ids, {'status': 'concluída'}),
+                           args.repeat, args.bulk, 'writes/s', params))
+
+    def delete_all():
+        create_all()
+        return timed(client.bulk_delete_tasks, ids)
+
+    results.append(measure('bulk delete (+ create)', delete_all, args.repeat, args.bulk * 2, 'writes/s', params))
+    client.close()
+    return results
+
+
+def bench_search(server, args):
+    results = []
+    user_id = user_id_for(EMAIL)
+    for size in args.sizes:
+        server.store.clear()
+        server.store.seed_tasks(user_id, size, args.description_size)
+        client = signed_in_client(server)
+        tasks = client.list_tasks(user_id)
+        client.close()
+        index = TaskSearchIndex()
+
+        def build():
+            index.clear()
+            for task in tasks:
+                index.add(task)
+            return []
+
+        results.append(measure('search index build', build, args.repeat, size, 'docs/s', {'tasks': size}))
+
+        def query():
+            samples = []
+            for q in SEARCH_QUERIES * 5:
+                start = time.perf_counter()
+                index.search(q, RESULT_LIMIT)
+                samples.append(time.perf_counter() - start)
+            return samples
+
+        results.append(measure('search query', query, args.repeat, len(SEARCH_QUERIES) * 5, 'queries/s',
+                               {'tasks': size, 'queries': SEARCH_QUERIES}))
+    return results
+
+
+def bench_export(server, args):
+    results = []
+    user_id = user_id_for(EMAIL)
+    formats = ['.csv']
+    try:
+        import openpyxl  # noqa: F401
+        formats.append('.xlsx')
+    except ImportError:
+        pass
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            server.store.clear()
+            server.store.seed_tasks(user_id, size, args.description_size)
+            client = signed_in_client(server)
+            for ext in formats:
+                path = os.path.join(tmp, 'export' + ext)
+                run = lambda: timed_pages(iter_export(task_pages(client, user_id, args.page_size), path))
+                result = measure(f'export {ext}', run, args.repeat, size, 'rows/s', {'tasks': size})
+                result['file_mb'] = round(os.path.getsize(path) / 1e6, 2)
+                results.append(result)
+            client.close()
+    return results
+
+
+SCENARIOS = {
+    'login': bench_login,
+    'list': bench_list,
+    'bulk': bench_bulk,
+    'search': bench_search,
+    'export': bench_export,
+}
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks do FirebaseClient contra um Auth/Firestore local.')
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1_000, 10_000, 100_000],
+                        help='Quantidades de tarefas para list, search e export (padrão: 1000 10000 100000).')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Atraso artificial por requisição no servidor.')
+    parser.add_argument('--repeat', type=int, default=3, help='Execuções por cenário; vale o melhor tempo.')
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--description-size', type=int, default=100, help='Tamanho da descrição de cada tarefa.')
+    parser.add_argument('--logins', type=int, default=50, help='Logins por execução do cenário login.')
+    parser.add_argument('--bulk', type=int, default=5_000, help='Escritas por execução do cenário bulk.')
+    parser.add_argument('--output', help='Arquivo JSON de saída (padrão: benchmarks/results/bench-<data>.json).')
+    args = parser.parse_args()
+
+    started = datetime.now()
+    results = []
+    with FakeFirebaseServer(latency=args.latency_ms / 1000) as server:
+        for name in args.scenarios:
+            results.extend(SCENARIOS[name](server, args))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"bench-{started:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    report = {
+        'meta': {
+            'started_at': started.isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'args': vars(args),
+        },
+        'results': results,
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados em {output}")
@@ -0,0 +1,79 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from firestore_codec import decode_run_query, to_firestore_fields
+
+
+def legacy_from_firestore_fields(f):
+    # Cadeia if/elif usada pelo FirebaseClient antes do firestore_codec, mantida aqui só como referência.
+    d = {}
+    for k, v in f.items():
+        if 'stringValue' in v:
+            d[k] = v['stringValue']
+        elif 'integerValue' in v:
+            d[k] = int(v['integerValue'])
+        elif 'doubleValue' in v:
+            d[k] = float(v['doubleValue'])
+        elif 'booleanValue' in v:
+            d[k] = v['booleanValue']
+        elif 'nullValue' in v:
+            d[k] = None
+        else:
+            d[k] = v
+    return d
+
+
+def legacy_decode(res):
+    return [{'id': item['document']['name'].split('/')[-1],
+             **legacy_from_firestore_fields(item['document']['fields'])}
+            for item in res if 'document' in item]
+
+
+def build_payload(count):
+    statuses = ['pendente', 'em andamento', 'concluída']
+    prios = ['baixa', 'média', 'alta']
+    res = []
+    for i in range(count):
+        fields = to_firestore_fields({
+            'titulo': f'Tarefa {i}',
+            'descricao': 'Descrição de exemplo ' * 5,
+            'status': statuses[i % 3],
+            'prioridade': prios[i % 3],
+            'due_date': '',
+            'user_id': 'uid-benchmark',
+            'created_at': 1700000000 + i,
+        })
+        res.append({'document': {'name': f'projects/p/databases/(default)/documents/tarefas/doc{i:08d}',
+                                 'fields': fields}, 'readTime': '2024-01-01T00:00:00Z'})
+    return json.dumps(res)
+
+
+def measure(fn, payload, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        res = json.loads(payload)
+        start = time.perf_counter()
+        fn(res)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Micro-benchmark de decodificação de respostas runQuery.')
+    parser.add_argument('--docs', type=int, default=100_000, help='Documentos no payload (padrão: 100000).')
+    parser.add_argument('--repeat', type=int, default=5, help='Repetições; vale o melhor tempo.')
+    args = parser.parse_args()
+
+    payload = build_payload(args.docs)
+    print(f"Payload: {args.docs} documentos, {len(payload) / 1e6:.1f} MB de JSON")
+    start = time.perf_counter()
+    json.loads(payload)
+    print(f"{'json.loads':<22}{time.perf_counter() - start:8.3f} s")
+    for name, fn in [('legacy if/elif', legacy_decode), ('firestore_codec', decode_run_query)]:
+        elapsed = measure(fn, payload, args.repeat)
+        print(f"{name:<22}{elapsed:8.3f} s  {args.docs / elapsed:12,.0f} docs/s")
@@ -0,0 +1,453 @@
+import base64
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from firestore_codec import decode_value, encode_value, from_firestore_fields, to_firestore_fields
+
+# Servidor HTTP local que imita o suficiente do Identity Toolkit, do Secure Token e da API REST do Firestore para
+# medir o FirebaseClient sem um projeto real. Não é um emulador: não há regras de segurança nem índices, e os
+# cursores de runQuery são resolvidos pelo nome do documento (último valor do cursor), como o cliente os monta.
+
+DOCUMENTS_RE = re.compile(r'^/v1/projects/(?P<project>[^/]+)/databases/\(default\)/documents(?P<rest>.*)$')
+STATUSES = ('pendente', 'em andamento', 'concluída')
+PRIORITIES = ('baixa', 'média', 'alta')
+GRPC_CODES = {'ALREADY_EXISTS': 6, 'NOT_FOUND': 5, 'INVALID_ARGUMENT': 3}
+HTTP_CODES = {'ALREADY_EXISTS': 409, 'NOT_FOUND': 404, 'INVALID_ARGUMENT': 400}
+
+
+def _timestamp():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).rstrip(b'=').decode('ascii')
+
+
+def user_id_for(email):
+    return 'u' + hashlib.sha1(email.encode('utf-8')).hexdigest()[:27]
+
+
+def make_id_token(user_id, email, role='user', lifetime=3600):
+    now = int(time.time())
+    claims = {'user_id': user_id, 'sub': user_id, 'email': email, 'role': role, 'iat': now, 'exp': now + lifetime}
+    return f"{_b64({'alg': 'none', 'typ': 'JWT'})}.{_b64(claims)}.sig"
+
+
+class WriteError(Exception):
+    def __init__(self, status, message):
+        self.status = status
+        super().__init__(message)
+
+
+class FakeFirestore:
+    def __init__(self, project_id='bench'):
+        self.project_id = project_id
+        self.collections = {}
+        self.version = 0
+        self.serialized = {}
+        self.query_cache = {}
+        self.lock = threading.Lock()
+
+    def _name(self, collection, doc_id):
+        return f"projects/{self.project_id}/databases/(default)/documents/{collection}/{doc_id}"
+
+    def _store(self, collection, doc_id, data):
+        self.collections.setdefault(collection, {})[doc_id] = data
+        self.serialized.pop((collection, doc_id), None)
+        self.version += 1
+
+    def _remove(self, collection, doc_id):
+        if self.collections.get(collection, {}).pop(doc_id, None) is not None:
+            self.serialized.pop((collection, doc_id), None)
+            self.version += 1
+
+    def seed_tasks(self, user_id, count, description_size=100, start=0):
+        # created_at/updated_at crescem com o índice: na lista (mais novas primeiro) a última semeada aparece no topo.
+        base = 1_700_000_000
+        description = ('Descrição de exemplo com acentuação e algumas palavras para a busca. ' * 20)[:description_size]
+        with self.lock:
+            tasks = self.collections.setdefault('tarefas', {})
+            for i in range(start, start + count):
+                tasks[f"seed{user_id[:6]}{i:09d}"] = {
+                    'titulo': f'Tarefa {i} revisar relatório {i % 97}',
+                    'descricao': description,
+                    'status': STATUSES[i % 3],
+                    'prioridade': PRIORITIES[i % 3],
+                    'due_date': '',
+                    'user_id': user_id,
+                    'created_at': base + i,
+                    'updated_at': datetime.fromtimestamp(base + i, timezone.utc),
+                }
+            self.version += 1
+
+    def clear(self):
+        with self.lock:
+            self.collections.clear()
+            self.serialized.clear()
+            self.query_cache.clear()
+            self.version += 1
+
+    def document(self, collection, doc_id, data, select=None):
+        # JSON de cada documento fica em cache até a próxima escrita nele: listas grandes viram um join de strings.
+        versions = self.serialized.setdefault((collection, doc_id), {})
+        cached = versions.get(select)
+        if cached is None:
+            fields = data if select is None else {f: data[f] for f in select if f in data}
+            cached = json.dumps({'name': self._name(collection, doc_id), 'fields': to_firestore_fields(fields),
+                                 'createTime': '2024-01-01T00:00:00.000000Z',
+                                 'updateTime': '2024-01-01T00:00:00.000000Z'}, ensure_ascii=False)
+            versions[select] = cached
+        return cached
+
+    # --- escrita de documentos ---
+
+    def create(self, collection, doc_id, fields):
+        with self.lock:
+            if doc_id in self.collections.get(collection, {}):
+                raise WriteError('ALREADY_EXISTS', f'Document already exists: {collection}/{doc_id}')
+            self._store(collection, doc_id, from_firestore_fields(fields))
+            return self.document(collection, doc_id, self.collections[collection][doc_id])
+
+    def batch_get(self, names, mask=None):
+        select = tuple(mask) if mask else None
+        with self.lock:
+            items = []
+            for name in names:
+                collection, doc_id = name.split('/documents/', 1)[1].split('/')
+                data = self.collections.get(collection, {}).get(doc_id)
+                if data is None:
+                    items.append(json.dumps({'missing': name}))
+                else:
+                    items.append('{"found": ' + self.document(collection, doc_id, data, select) + '}')
+            return '[' + ','.join(items) + ']'
+
+    def get(self, collection, doc_id):
+        with self.lock:
+            data = self.collections.get(collection, {}).get(doc_id)
+            if data is None:
+                raise WriteError('NOT_FOUND', f'No document to get: {collection}/{doc_id}')
+            return self.document(collection, doc_id, data)
+
+    def patch(self, collection, doc_id, fields, mask=None):
+        with self.lock:
+            self._update(collection, doc_id, fields, mask, None)
+            return self.document(collection, doc_id, self.collections[collection][doc_id])
+
+    def delete(self, collection, doc_id):
+        with self.lock:
+            self._remove(collection, doc_id)
+
+    def _update(self, collection, doc_id, fields, mask, exists, transforms=(), now=None):
+        current = self.collections.get(collection, {}).get(doc_id)
+        if exists is True and current is None:
+            raise WriteError('NOT_FOUND', f'No document to update: {collection}/{doc_id}')
+        if exists is False and current is not None:
+            raise WriteError('ALREADY_EXISTS', f'Document already exists: {collection}/{doc_id}')
+        values = from_firestore_fields(fields)
+        if mask is None:
+            data = values
+        else:
+            data = dict(current or {})
+            for path in mask:
+                if path in values:
+                    data[path] = values[path]
+                else:
+                    data.pop(path, None)
+        # Só o setToServerValue: REQUEST_TIME, o único que o cliente usa.
+        for transform in transforms:
+            data[transform['fieldPath']] = now
+        self._store(collection, doc_id, data)
+
+    def _target(self, write):
+        name = write['delete'] if 'delete' in write else write['update']['name']
+        collection, _, doc_id = name.partition('/documents/')[2].partition('/')
+        return collection, doc_id
+
+    def _check(self, write):
+        exists = write.get('currentDocument', {}).get('exists')
+        collection, doc_id = self._target(write)
+        present = doc_id in self.collections.get(collection, {})
+        if exists is True and not present:
+            raise WriteError('NOT_FOUND', f'No document to update: {collection}/{doc_id}')
+        if exists is False and present:
+            raise WriteError('ALREADY_EXISTS', f'Document already exists: {collection}/{doc_id}')
+
+    def _apply(self, write, now):
+        collection, doc_id = self._target(write)
+        result = {'updateTime': encode_value(now)['timestampValue']}
+        if 'delete' in write:
+            self._remove(collection, doc_id)
+            return result
+        mask = write.get('updateMask', {}).get('fieldPaths')
+        exists = write.get('currentDocument', {}).get('exists')
+        transforms = write.get('updateTransforms', [])
+        self._update(collection, doc_id, write['update'].get('fields', {}), mask, exists, transforms, now)
+        if transforms:
+            result['transformResults'] = [encode_value(now) for _ in transforms]
+        return result
+
+    def commit(self, writes):
+        # Tudo ou nada: as pré-condições de todas as escritas são checadas antes de aplicar a primeira.
+        with self.lock:
+            for write in writes:
+                self._check(write)
+            now = datetime.now(timezone.utc)
+            results = [self._apply(write, now) for write in writes]
+            return {'writeResults': results, 'commitTime': results[0]['updateTime'] if results else _timestamp()}
+
+    def batch_write(self, writes):
+        results, statuses = [], []
+        with self.lock:
+            now = datetime.now(timezone.utc)
+            for write in writes:
+                try:
+                    results.append(self._apply(write, now))
+                    statuses.append({'code': 0})
+                except WriteError as e:
+                    results.append({})
+                    statuses.append({'code': GRPC_CODES[e.status], 'message': str(e)})
+        return {'writeResults': results, 'status': statuses}
+
+    # --- consultas ---
+
+    def _matches(self, data, where):
+        if where is None:
+            return True
+        if 'compositeFilter' in where:
+            return all(self._matches(data, f) for f in where['compositeFilter']['filters'])
+        f = where['fieldFilter']
+        path = f['field']['fieldPath']
+        if path not in data:
+            return False
+        value, target = data[path], decode_value(f['value'])
+        op = f['op']
+        try:
+            if op == 'EQUAL':
+                return value == target
+            if op == 'NOT_EQUAL':
+                return value != target
+            if op == 'IN':
+                return value in target
+            if op == 'NOT_IN':
+                return value not in target
+            if op == 'ARRAY_CONTAINS':
+                return isinstance(value, list) and target in value
+            if op == 'LESS_THAN':
+                return value < target
+            if op == 'LESS_THAN_OR_EQUAL':
+                return value <= target
+            if op == 'GREATER_THAN':
+                return value > target
+            if op == 'GREATER_THAN_OR_EQUAL':
+                return value >= target
+        except TypeError:
+            return False
+        raise WriteError('INVALID_ARGUMENT', f'Unsupported filter op: {op}')
+
+    def _sorted_ids(self, collection, where, order_by):
+        # O resultado ordenado de cada consulta (sem cursor e sem limit) fica em cache até a próxima escrita.
+        key = (collection, json.dumps(where, sort_keys=True), json.dumps(order_by, sort_keys=True))
+        cached = self.query_cache.get(key)
+        if cached is not None and cached[0] == self.version:
+            return cached[1], cached[2]
+        docs = self.collections.get(collection, {})
+        fields = [o['field']['fieldPath'] for o in order_by if o['field']['fieldPath'] != '__name__']
+        ids = [doc_id for doc_id, data in docs.items()
+               if self._matches(data, where) and all(f in data for f in fields)]
+        # Ordenações estáveis do último critério para o primeiro: cada campo com sua própria direção.
+        for order in reversed(order_by or [{'field': {'fieldPath': '__name__'}}]):
+            path = order['field']['fieldPath']
+            reverse = order.get('direction') == 'DESCENDING'
+            ids.sort(key=(lambda i: i) if path == '__name__' else (lambda i, p=path: docs[i][p]), reverse=reverse)
+        positions = {doc_id: n for n, doc_id in enumerate(ids)}
+        self.query_cache[key] = (self.version, ids, positions)
+        return ids, positions
+
+    def run_query(self, query):
+        collection = query['from'][0]['collectionId']
+        select = query.get('select')
+        select = tuple(f['fieldPath'] for f in select['fields']) if select else None
+        with self.lock:
+            ids, positions = self._sorted_ids(collection, query.get('where'), query.get('orderBy', []))
+            start = 0
+            cursor = query.get('startAt')
+            if cursor:
+                last = cursor['values'][-1].get('referenceValue', '')
+                start = positions.get(last.rpartition('/')[2], -1) + (0 if cursor.get('before') else 1)
+            limit = query.get('limit')
+            page = ids[start:start + limit] if limit else ids[start:]
+            docs = self.collections.get(collection, {})
+            read_time = _timestamp()
+            if not page:
+                return json.dumps([{'readTime': read_time}])
+            return '[' + ','.join(f'{{"document":{self.document(collection, doc_id, docs[doc_id], select)},'
+                                  f'"readTime":"{read_time}"}}' for doc_id in page) + ']'
+
+    def run_aggregation(self, aggregation_query):
+        query = aggregation_query['structuredQuery']
+        collection = query['from'][0]['collectionId']
+        with self.lock:
+            docs = [d for d in self.collections.get(collection, {}).values() if self._matches(d, query.get('where'))]
+        result = {}
+        for aggregation in aggregation_query['aggregations']:
+            alias = aggregation['alias']
+            if 'count' in aggregation:
+                result[alias] = len(docs)
+            else:
+                kind = 'sum' if 'sum' in aggregation else 'avg'
+                path = aggregation[kind]['field']['fieldPath']
+                values = [d[path] for d in docs if isinstance(d.get(path), (int, float))]
+                result[alias] = sum(values) if kind == 'sum' else (sum(values) / len(values) if values else None)
+        return json.dumps([{'result': {'aggregateFields': to_firestore_fields(result)}, 'readTime': _timestamp()}])
+
+
+class FakeFirebaseServer:
+    # Uso: with FakeFirebaseServer(latency=0.02) as server: FirebaseClient.for_emulator(..., server.host, server.host)
+    def __init__(self, project_id='bench', latency=0.0, host='127.0.0.1', port=0):
+        self.store = FakeFirestore(project_id)
+        self.latency = latency
+        self.requests = 0
+        handler = type('Handler', (_Handler,), {'server_state': self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def host(self):
+        address, port = self.httpd.server_address[:2]
+        return f"{address}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_state = None
+    protocol_version = 'HTTP/1.1'
+    # Cabeçalho e corpo saem em dois writes; com Nagle ligado cada resposta esperaria o ACK atrasado (~40 ms).
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body):
+        payload = body.encode('utf-8') if isinstance(body, str) else json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _error(self, status, message):
+        self._reply(HTTP_CODES[status], {'error': {'code': HTTP_CODES[status], 'message': message, 'status': status}})
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        if self.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+            return {k: v[0] for k, v in parse_qs(raw.decode('utf-8')).items()}
+        return json.loads(raw) if raw else {}
+
+    def _handle(self, method):
+        state = self.server_state
+        state.requests += 1
+        if state.latency:
+            time.sleep(state.latency)
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        try:
+            body = self._body() if method in ('POST', 'PATCH') else {}
+            if url.path.endswith('/accounts:signInWithPassword') or url.path.endswith('/accounts:signUp'):
+                email = body.get('email', '')
+                user_id = user_id_for(email)
+                return self._reply(200, {'idToken': make_id_token(user_id, email), 'refreshToken': f'refresh-{user_id}',
+                                         'localId': user_id, 'email': email, 'expiresIn': '3600'})
+            if url.path.endswith('/token'):
+                user_id = body.get('refresh_token', '').replace('refresh-', '', 1)
+                return self._reply(200, {'id_token': make_id_token(user_id, ''), 'refresh_token': f'refresh-{user_id}',
+                                         'user_id': user_id, 'expires_in': '3600'})
+            match = DOCUMENTS_RE.match(url.path)
+            if not match:
+                return self._error('NOT_FOUND', f'Unknown path: {url.path}')
+            return self._firestore(method, match.group('rest'), params, body)
+        except WriteError as e:
+            return self._error(e.status, str(e))
+
+    def _firestore(self, method, rest, params, body):
+        store = self.server_state.store
+        if rest == ':runQuery':
+            return self._reply(200, store.run_query(body['structuredQuery']))
+        if rest == ':runAggregationQuery':
+            return self._reply(200, store.run_aggregation(body['structuredAggregationQuery']))
+        if rest == ':batchGet':
+            return self._reply(200, store.batch_get(body.get('documents', []), body.get('mask', {}).get('fieldPaths')))
+        if rest == ':commit':
+            return self._reply(200, store.commit(body.get('writes', [])))
+        if rest == ':batchWrite':
+            return self._reply(200, store.batch_write(body.get('writes', [])))
+        parts = rest.strip('/').split('/')
+        if method == 'POST' and len(parts) == 1:
+            doc_id = params.get('documentId', [None])[0] or os.urandom(10).hex()
+            return self._reply(200, store.create(parts[0], doc_id, body.get('fields', {})))
+        if len(parts) != 2:
+            return self._error('INVALID_ARGUMENT', f'Unsupported path: {rest}')
+        collection, doc_id = parts
+        if method == 'GET':
+            return self._reply(200, store.get(collection, doc_id))
+        if method == 'PATCH':
+            return self._reply(200, store.patch(collection, doc_id, body.get('fields', {}),
+                                                params.get('updateMask.fieldPaths')))
+        if method == 'DELETE':
+            store.delete(collection, doc_id)
+            return self._reply(200, {})
+        return self._error('INVALID_ARGUMENT', f'Unsupported method: {method}')
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PATCH(self):
+        self._handle('PATCH')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Servidor local que imita Auth e Firestore para testes de carga.')
+    parser.add_argument('--port', type=int, default=9099)
+    parser.add_argument('--latency-ms', type=float, default=0, help='Atraso artificial por requisição.')
+    parser.add_argument('--seed', type=int, default=0, help='Tarefas criadas para --email antes de começar.')
+    parser.add_argument('--email', default='bench@example.com')
+    args = parser.parse_args()
+
+    server = FakeFirebaseServer(latency=args.latency_ms / 1000, port=args.port)
+    if args.seed:
+        server.store.seed_tasks(user_id_for(args.email), args.seed)
+    print(f"Escutando em http://{server.host} (use FIREBASE_AUTH_EMULATOR_HOST e FIRESTORE_EMULATOR_HOST={server.host})")
+    server.start().thread.join()
@@ -0,0 +1,108 @@
+import csv
+import os
+
+from firebase_client import FirebaseError
+
+EXPORT_COLUMNS = ['id', 'titulo', 'descricao', 'status', 'prioridade', 'due_date', 'created_at', 'user_id']
+EXPORT_FORMATS = {
+    '.xlsx': 'Excel Files (*.xlsx)',
+    '.csv': 'CSV (*.csv)',
+    '.parquet': 'Parquet (*.parquet)',
+}
+
+
+def task_pages(client, user_id, page_size=500):
+    # Lê do Firestore página a página; se não houver conexão logo no início, usa o cache local.
+    pages = client.iter_task_pages(user_id, page_size)
+    try:
+        first = next(pages, None)
+    except (FirebaseError, OSError):
+        if client.cache is None:
+            raise
+        yield from client.cache.iter_pages(user_id, page_size)
+        return
+    if first is not None:
+        yield first
+        yield from pages
+
+
+class CsvWriter:
+    def __init__(self, path):
+        # utf-8-sig para o Excel reconhecer a acentuação ao abrir o CSV.
+        self.file = open(path, 'w', newline='', encoding='utf-8-sig')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(EXPORT_COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class XlsxWriter:
+    def __init__(self, path):
+        from openpyxl import Workbook
+        self.path = path
+        # Em write_only o openpyxl grava as linhas num arquivo temporário em vez de mantê-las em memória.
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet('Tarefas')
+        self.sheet.append(EXPORT_COLUMNS)
+
+    def write(self, rows):
+        for row in rows:
+            self.sheet.append(row)
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+class ParquetWriter:
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("A exportação para Parquet requer o pacote 'pyarrow' (pip install pyarrow).")
+        self.pa = pa
+        self.schema = pa.schema([(c, pa.int64() if c == 'created_at' else pa.string()) for c in EXPORT_COLUMNS])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        arrays = []
+        for values, field in zip(zip(*rows), self.schema):
+            convert = int if field.name == 'created_at' else str
+            arrays.append(self.pa.array([None if v in ('', None) else convert(v) for v in values], type=field.type))
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {'.xlsx': XlsxWriter, '.csv': CsvWriter, '.parquet': ParquetWriter}
+
+
+def export_rows(page):
+    return [[task.get(c, '') for c in EXPORT_COLUMNS] for task in page]
+
+
+def iter_export(pages, path):
+    # Gerador: grava uma página por vez e devolve o total já exportado, para progresso e cancelamento.
+    # Se for interrompido (cancelado ou com erro), apaga o arquivo incompleto.
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in WRITERS:
+        raise ValueError(f"Formato de exportação não suportado: '{ext}'. Use .xlsx, .csv ou .parquet.")
+    writer = WRITERS[ext](path)
+    written = 0
+    completed = False
+    try:
+        for page in pages:
+            if page:
+                writer.write(export_rows(page))
+                written += len(page)
+            yield written
+        completed = True
+    finally:
+        writer.close()
+        if not completed and os.path.exists(path):
+            os.remove(path)
@@ -1,138 +1,892 @@
 import requests
+from requests.adapters import HTTPAdapter
+import base64
+import copy
 import json
 import time
+import threading
+import secrets
+import string
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from urllib.parse import quote_plus
 
-class FirebaseClient:
-    def __init__(self, api_key, project_id):
+from firestore_codec import (to_firestore_fields, from_firestore_fields, decode_document, decode_documents, decode_value,
+                             encode_value)
+from metrics import ClientMetrics
+from resilience import (CircuitBreaker, ConcurrencyLimiter, RetryPolicy, IDEMPOTENT_METHODS, THROTTLE_STATUS,
+                        retry_after)
+
+IDENTITY_TOOLKIT_URL = "https://identitytoolkit.googleapis.com/v1"
+SECURE_TOKEN_URL = "https://securetoken.googleapis.com/v1"
+FIRESTORE_URL = "https://firestore.googleapis.com/v1"
+# Margem antes da expiração do ID token (1 h) em que o cliente já renova o token.
+TOKEN_REFRESH_MARGIN = 300
+# Campos que a lista de tarefas exibe; a descrição, potencialmente longa, só é baixada por get_task.
+TASK_SUMMARY_FIELDS = ('titulo', 'status', 'prioridade', 'due_date', 'user_id', 'created_at', 'updated_at')
+# O que get_tasks busca para completar tarefas da lista (ex.: para a busca por descrição).
+TASK_DETAIL_FIELDS = ('descricao', 'updated_at')
+# Documentos por chamada de documents:batchGet.
+BATCH_GET_LIMIT = 300
+# Limite de escritas por chamada de documents:commit / documents:batchWrite.
+BATCH_WRITE_LIMIT = 500
+# Cada exclusão deixa uma lápide (id, user_id, updated_at) nesta coleção para os outros clientes saberem dela.
+TOMBSTONE_COLLECTION = 'tarefas_removidas'
+# updated_at é gravado pelo próprio Firestore (REQUEST_TIME), não pelo relógio de quem escreve; no app ele vira
+# segundos inteiros. Uma escrita pode ficar visível depois de outra com horário maior (commits concorrentes): a
+# busca por alterações volta esse tanto antes da marca d'água para não perdê-la. Tarefas gravadas por versões
+# antigas do app têm updated_at inteiro, do relógio local, e não aparecem nas buscas por alteração; relógios com
+# diferença maior que DELTA_OVERLAP nessas versões não são suportados.
+DELTA_OVERLAP = 60
+UPDATED_AT_TRANSFORM = {"fieldPath": "updated_at", "setToServerValue": "REQUEST_TIME"}
+STATUS_VALUES = ('pendente', 'em andamento', 'concluída')
+PRIORITY_VALUES = ('baixa', 'média', 'alta')
+# Ordem crescente de status e prioridade para order_by(..., ranked=True); no Firestore a ordem seria a alfabética.
+FIELD_RANKS = {'status': STATUS_VALUES, 'prioridade': PRIORITY_VALUES}
+# Operadores de TaskQuery.where, com os mesmos nomes do SDK do Firestore.
+QUERY_OPERATORS = {
+    '==': 'EQUAL', '!=': 'NOT_EQUAL', '<': 'LESS_THAN', '<=': 'LESS_THAN_OR_EQUAL', '>': 'GREATER_THAN',
+    '>=': 'GREATER_THAN_OR_EQUAL', 'in': 'IN', 'not-in': 'NOT_IN', 'array-contains': 'ARRAY_CONTAINS',
+    'array-contains-any': 'ARRAY_CONTAINS_ANY',
+}
+INEQUALITY_OPERATORS = ('!=', '<', '<=', '>', '>=', 'not-in')
+
+
+class FirebaseError(Exception):
+    def __init__(self, error):
+        self.error = error.get('error', error) if isinstance(error, dict) else error
+        message = self.error.get('message', 'Erro desconhecido.') if isinstance(self.error, dict) else str(self.error)
+        super().__init__(message)
+
+
+def decode_token_claims(token):
+    # Lê o payload do ID token sem validar a assinatura: serve só para o cliente saber a role e a expiração do
+    # próprio token. Quem garante o acesso continua sendo o servidor, que valida o token em cada requisição.
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload))
+    except (AttributeError, IndexError, ValueError):
+        return {}
+
+
+def epoch_seconds(value):
+    return int(value.timestamp()) if isinstance(value, datetime) else value
+
+
+def task_watermark(tasks, current=0):
+    # Tarefas antigas, de antes do updated_at, contam pelo created_at.
+    return max([current, *(t.get('updated_at') or t.get('created_at') or 0 for t in tasks)])
+
+
+class TaskQuery:
+    # Consulta montada por encadeamento, como no SDK do Firestore. Cada método devolve uma cópia, então uma consulta
+    # base pode ser reaproveitada:
+    #   TaskQuery(uid).where('status', 'in', ['pendente', 'em andamento']).order_by('due_date').limit(50)
+    # Os índices compostos que essas combinações exigem estão em firestore.indexes.json.
+    def __init__(self, user_id=None, collection='tarefas'):
+        self.collection = collection
+        self.filters = [('user_id', '==', user_id)] if user_id is not None else []
+        self.orders = []
+        self.ranking = None
+        self.fields = None
+        self.max_results = None
+
+    @property
+    def user_id(self):
+        return next((value for field, op, value in self.filters if field == 'user_id' and op == '=='), None)
+
+    def _copy(self):
+        query = copy.copy(self)
+        query.filters = list(self.filters)
+        query.orders = list(self.orders)
+        return query
+
+    def where(self, field, op, value):
+        if op not in QUERY_OPERATORS:
+            raise ValueError(f"Operador desconhecido: {op}")
+        query = self._copy()
+        query.filters.append((field, op, value))
+        return query
+
+    def order_by(self, field, direction='asc', ranked=False):
+        # ranked=True ordena status/prioridade pelo significado (FIELD_RANKS): o cliente faz uma consulta por valor,
+        # na ordem do ranking, e as ordenações seguintes valem dentro de cada valor.
+        if direction not in ('asc', 'desc'):
+            raise ValueError(f"Direção inválida: {direction}")
+        query = self._copy()
+        if ranked:
+            if field not in FIELD_RANKS or self.orders or self.ranking:
+                raise ValueError(f"Ordenação por ranking só vale como a primeira e em: {', '.join(FIELD_RANKS)}")
+            query.ranking = (field, direction)
+        else:
+            query.orders.append((field, direction))
+        return query
+
+    def select(self, fields):
+        query = self._copy()
+        query.fields = tuple(fields) if fields else None
+        return query
+
+    def limit(self, count):
+        query = self._copy()
+        query.max_results = count
+        return query
+
+    def _allows(self, field, value):
+        for f, op, v in self.filters:
+            if f != field:
+                continue
+            if (op == '==' and value != v) or (op == 'in' and value not in v) \
+                    or (op == '!=' and value == v) or (op == 'not-in' and value in v):
+                return False
+        return True
+
+    def segments(self):
+        # Consultas que o cliente executa em sequência: a própria consulta, ou uma por valor do ranking (pulando os
+        # valores que os filtros já excluem).
+        if self.ranking is None:
+            return [self]
+        field, direction = self.ranking
+        values = FIELD_RANKS[field][::-1] if direction == 'desc' else FIELD_RANKS[field]
+        segments = []
+        for value in values:
+            if self._allows(field, value):
+                segment = self._copy()
+                segment.ranking = None
+                segment.filters = [f for f in self.filters if f[0] != field] + [(field, '==', value)]
+                segments.append(segment)
+        return segments
+
+    def order_fields(self):
+        # O Firestore rejeita ordenar por um campo com filtro de igualdade; sem ordenação, a desigualdade (se houver)
+        # precisa vir primeiro, senão vale a lista padrão, mais recentes primeiro.
+        equal = {f for f, op, _ in self.filters if op == '=='}
+        orders = [(f, d) for f, d in self.orders if f not in equal]
+        if orders:
+            return orders
+        inequality = next((f for f, op, _ in self.filters if op in INEQUALITY_OPERATORS), None)
+        return [(inequality, 'asc')] if inequality else [('created_at', 'desc')]
+
+    def to_structured_query(self, page_size=None, cursor=None):
+        query = {"from": [{"collectionId": self.collection}]}
+        filters = [{"fieldFilter": {"field": {"fieldPath": f}, "op": QUERY_OPERATORS[op], "value": encode_value(v)}}
+                   for f, op, v in self.filters]
+        if len(filters) == 1:
+            query["where"] = filters[0]
+        elif filters:
+            query["where"] = {"compositeFilter": {"op": "AND", "filters": filters}}
+        orders = self.order_fields()
+        # __name__ desempata documentos com o mesmo valor, para o cursor não pular nem repetir nenhum.
+        query["orderBy"] = [{"field": {"fieldPath": f}, "direction": "DESCENDING" if d == 'desc' else "ASCENDING"}
+                            for f, d in orders + [('__name__', orders[-1][1])]]
+        if page_size or self.max_results:
+            query["limit"] = page_size or self.max_results
+        if self.fields:
+            # Os campos da ordenação sempre vêm junto: é deles que sai o cursor da próxima página.
+            paths = list(dict.fromkeys([*self.fields, *(f for f, _ in orders)]))
+            query["select"] = {"fields": [{"fieldPath": f} for f in paths]}
+        if cursor:
+            # before=False equivale a startAfter: a página seguinte começa depois do último documento lido.
+            query["startAt"] = {"values": cursor, "before": False}
+        return {"structuredQuery": query}
+
+
+class FirebaseRestBase:
+    # Configuração, montagem de requisições e decodificação compartilhadas entre o cliente síncrono e o assíncrono.
+    def __init__(self, api_key, project_id, identity_url=IDENTITY_TOOLKIT_URL,
+                 secure_token_url=SECURE_TOKEN_URL, firestore_url=FIRESTORE_URL, retry=None, breaker=None,
+                 metrics=None):
         self.api_key = api_key
         self.project_id = project_id
         self.id_token = None
         self.local_id = None
         self.refresh_token = None
-        
+        self.claims = {}
+        self.profiles = {}
+        self.identity_url = identity_url.rstrip('/')
+        self.secure_token_url = secure_token_url.rstrip('/')
+        self.firestore_url = firestore_url.rstrip('/')
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.metrics = metrics or ClientMetrics()
+
+    @classmethod
+    def for_emulator(cls, api_key, project_id, auth_host='localhost:9099', firestore_host='localhost:8080', **kwargs):
+        # O emulador do Auth expõe as duas APIs de autenticação sob o mesmo host, prefixadas pelo nome do serviço.
+        return cls(api_key, project_id,
+                   identity_url=f"http://{auth_host}/identitytoolkit.googleapis.com/v1",
+                   secure_token_url=f"http://{auth_host}/securetoken.googleapis.com/v1",
+                   firestore_url=f"http://{firestore_host}/v1",
+                   **kwargs)
+
+    def _auth_headers(self):
+        return {'Authorization': f'Bearer {self.id_token}'}
+
+    def _sign_in_url(self):
+        return f"{self.identity_url}/accounts:signInWithPassword?key={self.api_key}"
+
+    def _sign_up_url(self):
+        return f"{self.identity_url}/accounts:signUp?key={self.api_key}"
+
+    def _refresh_url(self):
+        return f"{self.secure_token_url}/token?key={self.api_key}"
+
+    def _store_sign_in(self, data):
+        if 'idToken' in data:
+            self.id_token = data['idToken']
+            self.local_id = data['localId']
+            self.refresh_token = data.get('refreshToken')
+            self.claims = decode_token_claims(self.id_token)
+
+    def _store_refresh(self, data):
+        if 'id_token' in data:
+            self.id_token = data['id_token']
+            self.refresh_token = data['refresh_token']
+            self.claims = decode_token_claims(self.id_token)
+
+    @property
+    def role(self):
+        return self.claims.get('role')
+
+    @property
+    def token_expiry(self):
+        return self.claims.get('exp')
+
+    def _token_needs_refresh(self):
+        return bool(self.refresh_token and self.token_expiry and
+                    self.token_expiry - time.time() < TOKEN_REFRESH_MARGIN)
+
+    def _is_unauthenticated(self, status_code):
+        return status_code == 401
+
+    def _operation_name(self, method, url):
+        # Nome nas métricas: o verbo da API (runQuery, commit, signInWithPassword...) ou "MÉTODO coleção" para
+        # acessos diretos a documentos.
+        path = url.split('?', 1)[0]
+        tail = path.rpartition('/')[2]
+        if ':' in tail:
+            return tail.rpartition(':')[2]
+        if '/documents/' in path:
+            return f"{method} {path.split('/documents/', 1)[1].split('/')[0]}"
+        return f"{method} {tail}"
+
+    def _is_idempotent(self, method, idempotent):
+        # POSTs só são repetidos após erro transitório quando o chamador garante que repetir é seguro
+        # (runQuery, batchWrite com ids e preconditions, login).
+        return method in IDEMPOTENT_METHODS if idempotent is None else idempotent
+
+    def _cached_profile(self, user_id):
+        return self.profiles.get(user_id)
+
+    def _store_profile(self, user_id, profile):
+        if profile is not None:
+            self.profiles[user_id] = profile
+        return profile
+
+    def _base_url(self):
+        return f"{self.firestore_url}/projects/{self.project_id}/databases/(default)/documents"
+
+    def _doc_name(self, collection, doc_id):
+        return f"projects/{self.project_id}/databases/(default)/documents/{collection}/{doc_id}"
+
+    def new_task_id(self):
+        return self._new_doc_id()
+
+    def _new_doc_id(self):
+        alphabet = string.ascii_letters + string.digits
+        return ''.join(secrets.choice(alphabet) for _ in range(20))
+
+    def _new_task_op(self, user_id, doc, doc_id=None):
+        # Criação e edição individuais também vão por documents:commit: só ele aplica o updated_at do servidor.
+        fields = {**doc, 'user_id': user_id, 'created_at': int(time.time())}
+        return {'op': 'create', 'id': doc_id or self._new_doc_id(), 'fields': fields}
+
+    def _written_task(self, chunk, data, status_code):
+        # O commit não devolve o documento: a tarefa sai dos campos enviados mais o updated_at gerado pelo servidor.
+        if 'error' in data:
+            return data
+        result = self._batch_results(chunk, data, status_code)[0]
+        return {**chunk[0]['fields'], 'id': result['id'], 'updated_at': result['updated_at']}
+
+    def _encode_write(self, op):
+        name = self._doc_name('tarefas', op['id'])
+        if op['op'] == 'delete':
+            return {"delete": name}
+        fields = {k: v for k, v in op['fields'].items() if k != 'updated_at'}
+        if op['op'] == 'create':
+            return {"update": {"name": name, "fields": self._to_firestore_fields(fields)},
+                    "updateTransforms": [UPDATED_AT_TRANSFORM],
+                    "currentDocument": {"exists": False}}
+        if op['op'] == 'update':
+            return {"update": {"name": name, "fields": self._to_firestore_fields(fields)},
+                    "updateMask": {"fieldPaths": list(fields.keys())},
+                    "updateTransforms": [UPDATED_AT_TRANSFORM],
+                    "currentDocument": {"exists": True}}
+        raise ValueError(f"Operação desconhecida: {op['op']}")
+
+    def _tombstone_write(self, doc_id):
+        fields = {'user_id': self.local_id}
+        return {"update": {"name": self._doc_name(TOMBSTONE_COLLECTION, doc_id), "fields": self._to_firestore_fields(fields)},
+                "updateTransforms": [UPDATED_AT_TRANSFORM]}
+
+    def _op_writes(self, op):
+        if op['op'] == 'delete':
+            return [self._encode_write(op), self._tombstone_write(op['id'])]
+        return [self._encode_write(op)]
+
+    def _batch_chunks(self, ops):
+        chunk, writes = [], []
+        for op in ops:
+            if not op.get('id'):
+                op = {**op, 'id': self._new_doc_id()}
+            op_writes = self._op_writes(op)
+            if len(writes) + len(op_writes) > BATCH_WRITE_LIMIT:
+                yield chunk, {"writes": writes}
+                chunk, writes = [], []
+            chunk.append(op)
+            writes.extend(op_writes)
+        if chunk:
+            yield chunk, {"writes": writes}
+
+    def _batch_idempotent(self, chunk, atomic):
+        # Toda escrita leva id e precondition: repetir um batchWrite só devolve ALREADY_EXISTS por documento. Num
+        # commit atômico, porém, um create repetido derrubaria o lote inteiro.
+        return not atomic or all(op['op'] != 'create' for op in chunk)
+
+    def _batch_results(self, chunk, data, status_code):
+        # Uma exclusão ocupa duas escritas (documento e lápide); vale o status da primeira. Se só a lápide
+        # falhar, os outros clientes acertam a lista no próximo refresh completo.
+        positions = []
+        position = 0
+        for op in chunk:
+            positions.append(position)
+            position += 2 if op['op'] == 'delete' else 1
+        if 'error' in data:
+            message = data['error'].get('message', 'Erro desconhecido.')
+            statuses = [{"code": data['error'].get('code', status_code), "message": message}] * len(chunk)
+        elif data.get('status'):
+            statuses = [data['status'][position] for position in positions]
+        else:
+            statuses = [{"code": 0}] * len(chunk)
+        write_results = data.get('writeResults', [])
+        results = []
+        for op, status, position in zip(chunk, statuses, positions):
+            ok = status.get('code', 0) == 0
+            # Na exclusão, o horário do servidor vem da lápide, a única das duas escritas com transformação.
+            position += 1 if op['op'] == 'delete' else 0
+            transforms = write_results[position].get('transformResults') if position < len(write_results) else None
+            results.append({'id': op['id'], 'op': op['op'], 'ok': ok, 'code': status.get('code', 0),
+                            'error': None if ok else status.get('message'),
+                            'updated_at': epoch_seconds(decode_value(transforms[0])) if ok and transforms else None})
+        return results
+
+    def _tasks_query(self, user_id, page_size, cursor=None, fields=None):
+        return TaskQuery(user_id).select(fields).to_structured_query(page_size, cursor)
+
+    def _changes_query(self, collection, user_id, since, page_size, cursor=None, fields=None):
+        query = {
+            "structuredQuery": {
+                "from": [{"collectionId": collection}],
+                "where": {
+                    "compositeFilter": {
+                        "op": "AND",
+                        "filters": [
+                            {"fieldFilter": {"field": {"fieldPath": "user_id"}, "op": "EQUAL",
+                                             "value": {"stringValue": user_id}}},
+                            {"fieldFilter": {"field": {"fieldPath": "updated_at"}, "op": "GREATER_THAN_OR_EQUAL",
+                                             "value": encode_value(datetime.fromtimestamp(since, timezone.utc))}},
+                        ]
+                    }
+                },
+                "orderBy": [
+                    {"field": {"fieldPath": "updated_at"}, "direction": "ASCENDING"},
+                    {"field": {"fieldPath": "__name__"}, "direction": "ASCENDING"}
+                ],
+                "limit": page_size
+            }
+        }
+        if fields:
+            paths = list(dict.fromkeys([*fields, 'updated_at']))
+            query["structuredQuery"]["select"] = {"fields": [{"fieldPath": f} for f in paths]}
+        if cursor:
+            query["structuredQuery"]["startAt"] = {"values": cursor, "before": False}
+        return query
+
+    def _merge_changes(self, tasks, tombstones, watermark):
+        # Uma lápide só vale se for mais nova que a versão da tarefa no mesmo lote (ex.: reimportação com o mesmo id).
+        live = {t['id']: t.get('updated_at', 0) for t in tasks}
+        deleted = [t['id'] for t in tombstones if live.get(t['id'], -1) < t.get('updated_at', 0)]
+        deleted_ids = set(deleted)
+        changed = [t for t in tasks if t['id'] not in deleted_ids]
+        return changed, deleted, task_watermark(tasks + tombstones, watermark)
+
+    def _aggregation_query(self, user_id, filters, aggregations):
+        # user_id=None agrega as tarefas de todos os usuários (painel de admin).
+        conditions = dict(filters or {})
+        if user_id is not None:
+            conditions['user_id'] = user_id
+        field_filters = [{"fieldFilter": {"field": {"fieldPath": field}, "op": "EQUAL", "value": encode_value(value)}}
+                         for field, value in conditions.items()]
+        query = {"from": [{"collectionId": "tarefas"}]}
+        if len(field_filters) == 1:
+            query["where"] = field_filters[0]
+        elif field_filters:
+            query["where"] = {"compositeFilter": {"op": "AND", "filters": field_filters}}
+        encoded = []
+        for alias, (kind, field) in aggregations.items():
+            if kind == 'count':
+                encoded.append({"alias": alias, "count": {}})
+            elif kind in ('sum', 'avg'):
+                encoded.append({"alias": alias, kind: {"field": {"fieldPath": field}}})
+            else:
+                raise ValueError(f"Agregação desconhecida: {kind}")
+        return {"structuredAggregationQuery": {"structuredQuery": query, "aggregations": encoded}}
+
+    def _aggregation_result(self, res):
+        if isinstance(res, dict) or (res and 'error' in res[0]):
+            raise FirebaseError(res if isinstance(res, dict) else res[0])
+        for item in res:
+            if 'result' in item:
+                return self._from_firestore_fields(item['result'].get('aggregateFields', {}))
+        return {}
+
+    def _count_groups(self, groups):
+        # groups: {campo: [valores]} -> [(campo, valor)], com (None, None) para o total.
+        return [(None, None)] + [(field, value) for field, values in groups.items() for value in values]
+
+    def _group_filters(self, filters, field, value):
+        return {**(filters or {}), field: value} if field is not None else filters
+
+    def _group_counts(self, keys, counts):
+        summary = {'total': 0, **{field: {} for field, _ in keys if field is not None}}
+        for (field, value), count in zip(keys, counts):
+            if field is None:
+                summary['total'] = count
+            else:
+                summary[field][value] = count
+        return summary
+
+    def _batch_get_body(self, doc_ids, fields):
+        body = {"documents": [self._doc_name('tarefas', doc_id) for doc_id in doc_ids]}
+        if fields:
+            body["mask"] = {"fieldPaths": list(fields)}
+        return body
+
+    def _found_documents(self, res):
+        # Ids inexistentes (apagados nesse meio-tempo) voltam como "missing" e ficam de fora.
+        if isinstance(res, dict) or (res and 'error' in res[0]):
+            raise FirebaseError(res if isinstance(res, dict) else res[0])
+        return [item['found'] for item in res if 'found' in item]
+
+    def _query_documents(self, res):
+        if isinstance(res, dict) or (res and 'error' in res[0]):
+            raise FirebaseError(res if isinstance(res, dict) else res[0])
+        return [item['document'] for item in res if 'document' in item]
+
+    def _next_cursor(self, docs, *fields):
+        last = docs[-1]
+        return [last['fields'][f] for f in fields or ('created_at',)] + [{"referenceValue": last['name']}]
+
+    def _decode_task(self, doc):
+        return self._normalize_task(decode_document(doc))
+
+    def _decode_tasks(self, docs):
+        return [self._normalize_task(task) for task in decode_documents(docs)]
+
+    def _normalize_task(self, task):
+        if 'updated_at' in task:
+            task['updated_at'] = epoch_seconds(task['updated_at'])
+        return task
+
+    def _to_firestore_fields(self, d: dict):
+        return to_firestore_fields(d)
+
+    def _from_firestore_fields(self, f: dict):
+        return from_firestore_fields(f)
+
+
+class FirebaseClient(FirebaseRestBase):
+    def __init__(self, api_key, project_id, identity_url=IDENTITY_TOOLKIT_URL,
+                 secure_token_url=SECURE_TOKEN_URL, firestore_url=FIRESTORE_URL,
+                 pool_connections=4, pool_maxsize=16, timeout=(5, 30), cache=None, retry=None, breaker=None,
+                 metrics=None):
+        super().__init__(api_key, project_id, identity_url, secure_token_url, firestore_url, retry, breaker, metrics)
+        self.timeout = timeout
+        self.session = self._build_session(pool_connections, pool_maxsize)
+        self.limiter = ConcurrencyLimiter(pool_maxsize)
+        self.cache = cache
+        self.task_details = {}
+        self.refresh_lock = threading.Lock()
+        self.refresh_timer = None
+
+    def _build_session(self, pool_connections, pool_maxsize):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def _request(self, method, url, idempotent=None, operation=None, **kwargs):
+        # Cada chamada vira um registro nas métricas, com a latência total percebida (repetições incluídas).
+        operation = operation or self._operation_name(method, url)
+        started = time.perf_counter()
+        try:
+            r, retries = self._send(method, url, self._is_idempotent(method, idempotent), **kwargs)
+        except Exception as e:
+            self.metrics.record(operation, None, time.perf_counter() - started, error=type(e).__name__)
+            raise
+        body = r.request.body
+        self.metrics.record(operation, r.status_code, time.perf_counter() - started,
+                            len(body) if body else 0, len(r.content), retries)
+        return r
+
+    def _send(self, method, url, idempotent, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            self.breaker.before_request()
+            self.limiter.acquire()
+            status = None
+            try:
+                r = self.session.request(method, url, **kwargs)
+                status = r.status_code
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.breaker.record(None)
+                # Sem conexão estabelecida a requisição nem chegou ao servidor: repetir é seguro para qualquer método.
+                if not self.retry.should_retry(attempt, None, idempotent or isinstance(e, requests.ConnectTimeout)):
+                    raise
+                delay = self.retry.delay(attempt)
+            except Exception:
+                # Qualquer outra falha (ex.: ChunkedEncodingError) também fecha a tentativa no circuito; sem isso uma
+                # requisição de teste deixaria o circuito meio aberto, recusando tudo, para sempre.
+                self.breaker.record(status)
+                raise
+            except BaseException:
+                self.breaker.abandon()
+                raise
+            else:
+                self.breaker.record(status)
+                if not self.retry.should_retry(attempt, status, idempotent):
+                    return r, attempt
+                delay = self.retry.delay(attempt, retry_after(r.headers))
+                r.close()
+            finally:
+                self.limiter.release(status in THROTTLE_STATUS)
+            attempt += 1
+            time.sleep(delay)
+
+    def _authorized_request(self, method, url, idempotent=None, operation=None, **kwargs):
+        if self._token_needs_refresh():
+            self._refresh_if_current(self.id_token)
+        token = self.id_token
+        r = self._request(method, url, idempotent, operation, headers=self._auth_headers(), **kwargs)
+        if self._is_unauthenticated(r.status_code) and self.refresh_token:
+            # Um único refresh-e-repetição: se o token continuar recusado, o erro vai para o chamador.
+            self._refresh_if_current(token)
+            r = self._request(method, url, idempotent, operation, headers=self._auth_headers(), **kwargs)
+        return r
+
+    def _refresh_if_current(self, stale_token):
+        # Várias threads podem notar o token vencido ao mesmo tempo; só a primeira chama o Secure Token e
+        # as outras, ao conseguir o lock, já encontram o token novo e seguem sem outra chamada.
+        with self.refresh_lock:
+            if self.id_token != stale_token:
+                return None
+            return self.refresh_id_token()
+
+    def _schedule_refresh(self):
+        if self.refresh_timer is not None:
+            self.refresh_timer.cancel()
+            self.refresh_timer = None
+        if not self.refresh_token or not self.token_expiry:
+            return
+        delay = max(self.token_expiry - time.time() - TOKEN_REFRESH_MARGIN, 0)
+        token = self.id_token
+        self.refresh_timer = threading.Timer(delay, self._background_refresh, args=(token,))
+        self.refresh_timer.daemon = True
+        self.refresh_timer.start()
+
+    def _background_refresh(self, token):
+        try:
+            self._refresh_if_current(token)
+        except (requests.RequestException, ConnectionError):
+            # Sem rede agora; a próxima chamada autenticada tenta de novo antes de enviar a requisição.
+            pass
+
+    def close(self):
+        if self.refresh_timer is not None:
+            self.refresh_timer.cancel()
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
     def sign_up(self, email, password):
-        url = f"https://identitytoolkit.googleapis.com/v1/accounts:signUp?key={self.api_key}"
         payload = {"email": email, "password": password, "returnSecureToken": True}
-        r = requests.post(url, json=payload)
+        r = self._request('POST', self._sign_up_url(), json=payload)
         return r.json()
     
     def sign_in(self, email, password):
-        url = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={self.api_key}"
         payload = {"email": email, "password": password, "returnSecureToken": True}
-        r = requests.post(url, json=payload)
+        r = self._request('POST', self._sign_in_url(), idempotent=True, json=payload)
         data = r.json()
-        if 'idToken' in data:
-            self.id_token = data['idToken']
-            self.local_id = data['localId']
-            self.refresh_token = data.get('refreshToken')
+        self._store_sign_in(data)
+        self._schedule_refresh()
         return data
     
     def refresh_id_token(self):
-        url = f"https://securetoken.googleapis.com/v1/token?key={self.api_key}"
         payload = {"grant_type":"refresh_token","refresh_token": self.refresh_token}
-        r = requests.post(url, data=payload)
+        r = self._request('POST', self._refresh_url(), idempotent=True, data=payload)
         data = r.json()
+        self._store_refresh(data)
         if 'id_token' in data:
-            self.id_token = data['id_token']
-            self.refresh_token = data['refresh_token']
+            self._schedule_refresh()
         return data
     
-    def _base_url(self):
-        return f"https://firestore.googleapis.com/v1/projects/{self.project_id}/databases/(default)/documents"
+    def create_task(self, user_id, doc, doc_id=None):
+        # Com doc_id gerado pelo chamador, a interface já conhece o id definitivo antes da resposta do servidor.
+        chunk, body = next(self._batch_chunks([self._new_task_op(user_id, doc, doc_id)]))
+        r = self._authorized_request('POST', self._base_url() + ":commit", operation='create_task', json=body)
+        task = self._written_task(chunk, r.json(), r.status_code)
+        if 'error' not in task:
+            self._store_task_detail(task)
+        return task
     
-    def create_task(self, user_id, doc):
-        url = self._base_url() + f"/tarefas"
-        body = {"fields": self._to_firestore_fields({**doc, 'user_id': user_id, 'created_at': int(time.time())})}
-        headers = {'Authorization': f'Bearer {self.id_token}'}
-        r = requests.post(url, json=body, headers=headers)
-        return r.json()
-    
-    def list_tasks(self, user_id):
-        url = f"https://firestore.googleapis.com/v1/projects/{self.project_id}/databases/(default)/documents:runQuery"
-        query = {
-            "structuredQuery": {
-                "from": [{"collectionId": "tarefas"}],
-                "where": {
-                    "fieldFilter": {
-                        "field": {"fieldPath": "user_id"},
-                        "op": "EQUAL",
-                        "value": {"stringValue": user_id}
-                    }
-                },
-                "orderBy": [{"field": {"fieldPath": "created_at"}, "direction": "DESCENDING"}]
-            }
-        }
-        headers = {'Authorization': f'Bearer {self.id_token}'}
-        r = requests.post(url, json=query, headers=headers)
-        res = r.json()
-        print("RESPOSTA COMPLETA DO FIREBASE:", res)
+    def iter_task_pages(self, user_id, page_size=500, fields=None):
+        # Com fields, cada tarefa vem só com esses campos; no cache elas são mescladas, preservando o resto.
+        url = self._base_url() + ":runQuery"
+        cursor = None
+        seen_ids = []
+        while True:
+            r = self._authorized_request('POST', url, idempotent=True, operation='list_tasks',
+                                         json=self._tasks_query(user_id, page_size, cursor, fields))
+            docs = self._query_documents(r.json())
+            page = self._decode_tasks(docs)
+            self._expire_details(page)
+            if self.cache is not None:
+                if fields:
+                    self.cache.merge(user_id, page)
+                else:
+                    self.cache.upsert(user_id, page)
+                seen_ids.extend(t['id'] for t in page)
+            if page:
+                yield page
+            if len(docs) < page_size:
+                break
+            cursor = self._next_cursor(docs)
+        # Só chega aqui quem percorreu todas as páginas: o que não veio do servidor foi apagado em outro lugar.
+        if self.cache is not None:
+            self.cache.prune(user_id, seen_ids)
+
+    def _query_changes(self, collection, user_id, since, page_size, fields=None):
+        url = self._base_url() + ":runQuery"
+        cursor = None
+        results = []
+        while True:
+            r = self._authorized_request('POST', url, idempotent=True, operation=f'list_changes {collection}',
+                                         json=self._changes_query(collection, user_id, since, page_size, cursor, fields))
+            docs = self._query_documents(r.json())
+            results.extend(self._decode_tasks(docs))
+            if len(docs) < page_size:
+                return results
+            cursor = self._next_cursor(docs, 'updated_at')
+
+    def list_tasks_changed_since(self, user_id, watermark, fields=None, page_size=500):
+        # Devolve (tarefas alteradas, ids removidos, nova marca d'água): o custo acompanha o número de alterações,
+        # não o total de tarefas. A marca d'água sai dos próprios documentos, nunca do relógio local.
+        since = max(watermark - DELTA_OVERLAP, 0)
+        tasks = self._query_changes('tarefas', user_id, since, page_size, fields)
+        tombstones = self._query_changes(TOMBSTONE_COLLECTION, user_id, since, page_size)
+        changed, deleted, watermark = self._merge_changes(tasks, tombstones, watermark)
+        for task_id in [t['id'] for t in changed] + deleted:
+            self.task_details.pop(task_id, None)
+        if self.cache is not None:
+            if fields:
+                self.cache.merge(user_id, changed)
+            else:
+                self.cache.upsert(user_id, changed)
+            self.cache.delete(user_id, deleted)
+        return changed, deleted, watermark
+
+    def run_task_query(self, query, cursor=None, page_size=500):
+        # Uma página de TaskQuery: devolve (tarefas, cursor), com até query.limit (ou page_size) tarefas. Para a
+        # página seguinte, chame de novo com o cursor devolvido; None indica que não há mais resultados.
+        url = self._base_url() + ":runQuery"
+        segments = query.segments()
+        wanted = query.max_results or page_size
+        index, after = cursor or (0, None)
         tasks = []
-        for item in res:
-            if 'document' in item:
-                doc = item['document']
-                fid = doc['name'].split('/')[-1]
-                tasks.append({'id': fid, **self._from_firestore_fields(doc['fields'])})
+        while index < len(segments) and len(tasks) < wanted:
+            segment = segments[index]
+            limit = wanted - len(tasks)
+            r = self._authorized_request('POST', url, idempotent=True, operation='query_tasks',
+                                         json=segment.to_structured_query(limit, after))
+            docs = self._query_documents(r.json())
+            tasks.extend(self._decode_tasks(docs))
+            if len(docs) < limit:
+                index, after = index + 1, None
+            else:
+                after = self._next_cursor(docs, *(f for f, _ in segment.order_fields()))
+        self._expire_details(tasks)
+        # O cache é separado por user_id; nada é podado, pois a consulta não traz todas as tarefas do usuário.
+        if self.cache is not None and query.user_id is not None:
+            if query.fields:
+                self.cache.merge(query.user_id, tasks)
+            else:
+                self.cache.upsert(query.user_id, tasks)
+        return tasks, ((index, after) if index < len(segments) else None)
+
+    def iter_tasks(self, user_id, page_size=500, fields=None):
+        for page in self.iter_task_pages(user_id, page_size, fields):
+            yield from page
+
+    def list_tasks(self, user_id, fields=None):
+        return list(self.iter_tasks(user_id, fields=fields))
+
+    def get_task(self, doc_id, refresh=False):
+        if not refresh and doc_id in self.task_details:
+            return self.task_details[doc_id]
+        r = self._authorized_request('GET', self._base_url() + f"/tarefas/{doc_id}")
+        data = r.json()
+        if 'name' not in data:
+            return data
+        task = self._decode_task(data)
+        self._store_task_detail(task)
+        return task
+
+    def get_tasks(self, doc_ids, fields=None):
+        # Várias tarefas por id numa chamada (documents:batchGet), opcionalmente só alguns campos.
+        url = self._base_url() + ":batchGet"
+        tasks = []
+        for start in range(0, len(doc_ids), BATCH_GET_LIMIT):
+            body = self._batch_get_body(doc_ids[start:start + BATCH_GET_LIMIT], fields)
+            r = self._authorized_request('POST', url, idempotent=True, operation='get_tasks', json=body)
+            tasks.extend(self._decode_tasks(self._found_documents(r.json())))
+        if self.cache is not None:
+            for user_id in {t.get('user_id', self.local_id) for t in tasks}:
+                owned = [t for t in tasks if t.get('user_id', self.local_id) == user_id]
+                if fields:
+                    self.cache.merge(user_id, owned)
+                else:
+                    self.cache.upsert(user_id, owned)
         return tasks
 
+    def _expire_details(self, tasks):
+        # Uma versão mais nova vinda da lista invalida o detalhe guardado por get_task.
+        for task in tasks:
+            detail = self.task_details.get(task['id'])
+            if detail is not None and detail.get('updated_at') != task.get('updated_at'):
+                del self.task_details[task['id']]
+
+    def _store_task_detail(self, task):
+        self.task_details[task['id']] = task
+        if self.cache is not None:
+            self.cache.upsert(task.get('user_id', self.local_id), [task])
+
+    def cached_tasks(self, user_id, search=None):
+        if self.cache is None:
+            return []
+        return self.cache.load(user_id, search)
+
     def update_task(self, doc_id, updates: dict):
-        base_url = self._base_url() + f"/tarefas/{doc_id}"
-        
-        params = [('updateMask.fieldPaths', key) for key in updates.keys()]
-        
-        body = {"fields": self._to_firestore_fields(updates)}
-        headers = {'Authorization': f'Bearer {self.id_token}'}
-        
-        r = requests.patch(base_url, params=params, json=body, headers=headers)
-        return r.json()
+        # Devolve a tarefa completa se o detalhe já era conhecido (ex.: aberto na edição); senão só os campos alterados.
+        chunk, body = next(self._batch_chunks([{'op': 'update', 'id': doc_id, 'fields': updates}]))
+        r = self._authorized_request('POST', self._base_url() + ":commit", idempotent=True, operation='update_task',
+                                     json=body)
+        task = self._written_task(chunk, r.json(), r.status_code)
+        if 'error' in task:
+            return task
+        known = self.task_details.get(doc_id)
+        if known is not None:
+            task = {**known, **task}
+            self._store_task_detail(task)
+        elif self.cache is not None:
+            self.cache.merge(self.local_id, [task])
+        return task
     
     def delete_task(self, doc_id):
-        url = self._base_url() + f"/tarefas/{doc_id}"
-        headers = {'Authorization': f'Bearer {self.id_token}'}
-        r = requests.delete(url, headers=headers)
+        # Exclusão e lápide vão no mesmo commit: ou as duas acontecem, ou nenhuma.
+        _, body = next(self._batch_chunks([{'op': 'delete', 'id': doc_id}]))
+        r = self._authorized_request('POST', self._base_url() + ":commit", idempotent=True, json=body)
+        if r.status_code in (200, 204):
+            self.task_details.pop(doc_id, None)
+            if self.cache is not None:
+                self.cache.delete(self.local_id, [doc_id])
         return r.status_code
     
-    def get_user_profile(self, user_id):
+    def batch_write(self, ops, atomic=False):
+        # ops: [{'op': 'create' | 'update' | 'delete', 'id': doc_id, 'fields': {...}}]
+        # atomic=True usa documents:commit (tudo ou nada por lote); senão documents:batchWrite, com status por documento.
+        endpoint = ":commit" if atomic else ":batchWrite"
+        results = []
+        for chunk, body in self._batch_chunks(ops):
+            r = self._authorized_request('POST', self._base_url() + endpoint, self._batch_idempotent(chunk, atomic),
+                                         json=body)
+            chunk_results = self._batch_results(chunk, r.json(), r.status_code)
+            results.extend(chunk_results)
+            self._apply_to_cache(chunk, chunk_results)
+        return results
+
+    def _apply_to_cache(self, chunk, results):
+        ops = [(op, res) for op, res in zip(chunk, results) if res['ok']]
+        for op, _ in ops:
+            self.task_details.pop(op['id'], None)
+        if self.cache is None or not ops:
+            return
+        user_id = self.local_id
+        upserts = []
+        for op, res in ops:
+            if op['op'] == 'delete':
+                continue
+            current = self.cache.get(user_id, op['id']) or {'id': op['id']}
+            upserts.append({**current, **op['fields'], 'updated_at': res['updated_at'] or current.get('updated_at')})
+        self.cache.upsert(user_id, upserts)
+        self.cache.delete(user_id, [op['id'] for op, _ in ops if op['op'] == 'delete'])
+
+    def bulk_update_tasks(self, doc_ids, updates: dict):
+        return self.batch_write([{'op': 'update', 'id': doc_id, 'fields': updates} for doc_id in doc_ids])
+
+    def bulk_delete_tasks(self, doc_ids):
+        return self.batch_write([{'op': 'delete', 'id': doc_id} for doc_id in doc_ids])
+
+    def aggregate_tasks(self, user_id=None, filters=None, aggregations=None):
+        # aggregations: {alias: ('count', None) | ('sum', campo) | ('avg', campo)}, no máximo 5 por consulta.
+        # Só os números trafegam: o custo é o mesmo com dez ou com cem mil tarefas.
+        aggregations = aggregations or {'count': ('count', None)}
+        url = self._base_url() + ":runAggregationQuery"
+        r = self._authorized_request('POST', url, idempotent=True,
+                                     json=self._aggregation_query(user_id, filters, aggregations))
+        return self._aggregation_result(r.json())
+
+    def count_tasks(self, user_id=None, filters=None):
+        return self.aggregate_tasks(user_id, filters).get('count', 0)
+
+    def count_tasks_by(self, user_id, groups, filters=None):
+        # Uma contagem por valor (o Firestore não agrupa), todas em paralelo:
+        # {'total': n, 'status': {'pendente': n, ...}, 'prioridade': {...}}.
+        keys = self._count_groups(groups)
+        with ThreadPoolExecutor(max_workers=len(keys)) as pool:
+            counts = list(pool.map(lambda key: self.count_tasks(user_id, self._group_filters(filters, *key)), keys))
+        return self._group_counts(keys, counts)
+
+    def get_user_profile(self, user_id, refresh=False):
+        if not refresh and self._cached_profile(user_id) is not None:
+            return self._cached_profile(user_id)
         url = self._base_url() + f"/users/{user_id}"
-        headers = {'Authorization': f'Bearer {self.id_token}'}
-        r = requests.get(url, headers=headers)
+        r = self._authorized_request('GET', url)
         if r.status_code == 200:
             data = r.json()
-            return self._from_firestore_fields(data.get('fields', {}))
+            return self._store_profile(user_id, self._from_firestore_fields(data.get('fields', {})))
         return None
-    
-    def _to_firestore_fields(self, d: dict):
-        out = {}
-        for k, v in d.items():
-            if isinstance(v, int):
-                out[k] = {"integerValue": str(v)}
-            elif isinstance(v, float):
-                out[k] = {"doubleValue": v}
-            elif isinstance(v, bool):
-                out[k] = {"booleanValue": v}
-            elif v is None:
-                out[k] = {"nullValue": None}
-            else:
-                out[k] = {"stringValue": str(v)}
-        return out
 
-    def _from_firestore_fields(self, f: dict):
-        d = {}
-        for k, v in f.items():
-            if 'stringValue' in v:
-                d[k] = v['stringValue']
-            elif 'integerValue' in v:
-                d[k] = int(v['integerValue'])
-            elif 'doubleValue' in v:
-                d[k] = float(v['doubleValue'])
-            elif 'booleanValue' in v:
-                d[k] = v['booleanValue']
-            elif 'nullValue' in v:
-                d[k] = None
-            else:
-                d[k] = v
-        return d
-    
-    
-    
-    
\ No newline at end of file
+    def get_user_role(self, user_id):
+        # A role vem da custom claim do token (definida por admin_tools.set_role); o perfil no Firestore
+        # só é consultado para usuários antigos que ainda não têm a claim.
+        if user_id == self.local_id and self.role:
+            return self.role
+        profile = self.get_user_profile(user_id)
+        return profile.get('role') if profile else None
@@ -0,0 +1,112 @@
+import base64
+from collections import namedtuple
+from datetime import datetime, timezone
+
+
+class Reference(str):
+    # Caminho completo de um documento ("projects/.../documents/users/abc"), codificado como referenceValue.
+    pass
+
+
+class GeoPoint(namedtuple('GeoPoint', 'latitude longitude')):
+    # Codificado como geoPointValue; um dict ou uma tupla comum voltariam ao Firestore como mapValue/arrayValue.
+    __slots__ = ()
+
+
+def _encode_timestamp(v):
+    if v.tzinfo is None:
+        v = v.replace(tzinfo=timezone.utc)
+    return {"timestampValue": v.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')}
+
+
+def _decode_timestamp(raw):
+    # O Firestore manda até 9 casas decimais e sufixo Z; fromisoformat aceita no máximo 6 e só offsets explícitos.
+    main, _, rest = raw.rstrip('Z').partition('.')
+    fraction = rest[:6].ljust(6, '0') if rest else '000000'
+    return datetime.fromisoformat(f"{main}.{fraction}+00:00")
+
+
+def encode_value(v):
+    encoder = ENCODERS.get(type(v))
+    if encoder is None:
+        # Subclasses (ex.: IntEnum, OrderedDict) caem no encoder do tipo base mais próximo.
+        encoder = next((ENCODERS[base] for base in type(v).__mro__ if base in ENCODERS), _encode_default)
+    return encoder(v)
+
+
+def _encode_default(v):
+    return {"stringValue": str(v)}
+
+
+ENCODERS = {
+    type(None): lambda v: {"nullValue": None},
+    bool: lambda v: {"booleanValue": v},
+    int: lambda v: {"integerValue": str(v)},
+    float: lambda v: {"doubleValue": v},
+    str: lambda v: {"stringValue": v},
+    Reference: lambda v: {"referenceValue": str(v)},
+    GeoPoint: lambda v: {"geoPointValue": {"latitude": float(v.latitude), "longitude": float(v.longitude)}},
+    bytes: lambda v: {"bytesValue": base64.b64encode(v).decode('ascii')},
+    bytearray: lambda v: {"bytesValue": base64.b64encode(bytes(v)).decode('ascii')},
+    datetime: _encode_timestamp,
+    dict: lambda v: {"mapValue": {"fields": to_firestore_fields(v)}},
+    list: lambda v: {"arrayValue": {"values": [encode_value(x) for x in v]}},
+    tuple: lambda v: {"arrayValue": {"values": [encode_value(x) for x in v]}},
+}
+
+
+def decode_value(v):
+    for key, raw in v.items():
+        decoder = DECODERS.get(key)
+        return decoder(raw) if decoder is not None else v
+    return None
+
+
+DECODERS = {
+    'stringValue': lambda raw: raw,
+    'integerValue': int,
+    'doubleValue': float,
+    'booleanValue': lambda raw: raw,
+    'nullValue': lambda raw: None,
+    'timestampValue': _decode_timestamp,
+    'bytesValue': base64.b64decode,
+    'referenceValue': Reference,
+    'geoPointValue': lambda raw: GeoPoint(raw.get('latitude', 0.0), raw.get('longitude', 0.0)),
+    'mapValue': lambda raw: from_firestore_fields(raw.get('fields', {})),
+    'arrayValue': lambda raw: [decode_value(x) for x in raw.get('values', [])],
+}
+
+
+def to_firestore_fields(d: dict):
+    return {k: encode_value(v) for k, v in d.items()}
+
+
+def from_firestore_fields(f: dict, out=None):
+    # stringValue e integerValue são a imensa maioria dos campos das tarefas: testá-los direto, antes da tabela,
+    # evita uma chamada de função por campo no caminho quente.
+    out = {} if out is None else out
+    for k, v in f.items():
+        s = v.get('stringValue')
+        if s is not None:
+            out[k] = s
+            continue
+        i = v.get('integerValue')
+        if i is not None:
+            out[k] = int(i)
+            continue
+        out[k] = decode_value(v)
+    return out
+
+
+def decode_document(doc):
+    fid = doc['name'].rpartition('/')[2]
+    return from_firestore_fields(doc.get('fields', {}), {'id': fid})
+
+
+def decode_documents(docs):
+    return [decode_document(doc) for doc in docs]
+
+
+def decode_run_query(res):
+    # Resposta inteira de um runQuery: itens sem 'document' (só readTime, fim de stream) são ignorados.
+    return [decode_document(item['document']) for item in res if 'document' in item]
@@ -0,0 +1,255 @@
+import argparse
+import csv
+import getpass
+import hashlib
+import json
+import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import date, datetime
+
+from firebase_client import BATCH_WRITE_LIMIT, STATUS_VALUES, PRIORITY_VALUES
+
+# Código gRPC ALREADY_EXISTS: a tarefa já foi gravada, numa execução anterior ou por uma tentativa repetida do
+# mesmo lote (batchWrite é reenviado após um erro 5xx).
+ALREADY_EXISTS = 6
+
+
+class ImportProgress:
+    def __init__(self, source):
+        self.source = source
+        self.rows_read = 0
+        self.imported = 0
+        self.skipped = 0
+        self.failed = 0
+        self.invalid = []
+        self.errors = []
+        self.finished = False
+
+    def summary(self):
+        return (f"{self.imported} importadas, {self.skipped} já existiam, "
+                f"{len(self.invalid)} inválidas, {self.failed} com falha")
+
+
+def read_rows(path):
+    # Lê linha a linha (CSV) ou em modo read_only (XLSX): o arquivo nunca é carregado inteiro na memória.
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            yield from csv.DictReader(f)
+    elif ext == '.xlsx':
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(h).strip() if h is not None else '' for h in next(rows, [])]
+            for values in rows:
+                yield dict(zip(header, values))
+        finally:
+            workbook.close()
+    else:
+        raise ValueError(f"Formato de importação não suportado: '{ext}'. Use .csv ou .xlsx.")
+
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+def validate_row(row):
+    titulo = _text(row.get('titulo'))
+    if not titulo:
+        raise ValueError('titulo é obrigatório')
+    status = _text(row.get('status')).lower() or 'pendente'
+    if status not in STATUS_VALUES:
+        raise ValueError(f"status inválido: '{status}'")
+    prioridade = _text(row.get('prioridade')).lower() or 'baixa'
+    if prioridade not in PRIORITY_VALUES:
+        raise ValueError(f"prioridade inválida: '{prioridade}'")
+    due_date = row.get('due_date')
+    if isinstance(due_date, (datetime, date)):
+        due_date = due_date.strftime('%Y-%m-%d')
+    else:
+        due_date = _text(due_date)
+        if due_date:
+            try:
+                date.fromisoformat(due_date)
+            except ValueError:
+                raise ValueError(f"due_date deve estar no formato AAAA-MM-DD: '{due_date}'")
+    return {
+        'titulo': titulo,
+        'descricao': _text(row.get('descricao')),
+        'status': status,
+        'prioridade': prioridade,
+        'due_date': due_date,
+    }
+
+
+def import_doc_id(user_id, run_id, row_number):
+    # Id determinístico por (usuário, execução, linha): retomar a mesma importação não duplica tarefas, mas outro
+    # arquivo com o mesmo nome, ou o mesmo arquivo editado, é uma execução nova e nunca colide com a anterior.
+    digest = hashlib.sha1(f"{user_id}:{run_id}:{row_number}".encode('utf-8')).hexdigest()
+    return f"imp{digest[:17]}"
+
+
+def checkpoint_path_for(source):
+    return source + '.import-checkpoint.json'
+
+
+def file_signature(source):
+    stat = os.stat(source)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def load_checkpoint(path, source, user_id):
+    # Devolve (linhas já gravadas, id da execução, linhas já enviadas); sem checkpoint válido para este arquivo, uma
+    # execução nova.
+    new_run = (0, secrets.token_hex(8), 0)
+    if not os.path.exists(path):
+        return new_run
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('source') != os.path.abspath(source) or data.get('user_id') != user_id \
+            or data.get('signature') != file_signature(source) or not data.get('run_id'):
+        return new_run
+    rows_done = data.get('rows_done', 0)
+    return rows_done, data['run_id'], max(data.get('rows_sent', rows_done), rows_done)
+
+
+def save_checkpoint(path, source, user_id, rows_done, run_id, rows_sent):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'source': os.path.abspath(source), 'user_id': user_id, 'signature': file_signature(source),
+                   'run_id': run_id, 'rows_done': rows_done, 'rows_sent': rows_sent}, f)
+    os.replace(tmp, path)
+
+
+def iter_import(client, user_id, source, parallelism=4, batch_size=BATCH_WRITE_LIMIT, restart=False):
+    # Gerador: valida as linhas, grava lotes de batch_size via batchWrite com até `parallelism` lotes em voo e
+    # devolve o ImportProgress a cada lote concluído. O checkpoint guarda até que linha tudo já foi gravado,
+    # avançando só quando os lotes anteriores também terminaram; ao retomar, essas linhas são puladas.
+    progress = ImportProgress(source)
+    checkpoint = checkpoint_path_for(source)
+    start_row, run_id, resent_until = (0, secrets.token_hex(8), 0) if restart \
+        else load_checkpoint(checkpoint, source, user_id)
+    # Gravado antes do primeiro lote: se a execução cair no meio, a retomada reusa o mesmo run_id e os mesmos ids.
+    save_checkpoint(checkpoint, source, user_id, start_row, run_id, resent_until)
+    created_at = int(time.time())
+
+    pending = {}
+    done_batches = {}
+    watermark = start_row
+    rows_sent = resent_until
+
+    def collect(futures):
+        nonlocal watermark
+        for future in futures:
+            first_row, last_row, resent = pending.pop(future)
+            batch_failed = False
+            for res in future.result():
+                if res['ok']:
+                    progress.imported += 1
+                elif res.get('code') == ALREADY_EXISTS and res['id'] in resent:
+                    progress.skipped += 1
+                elif res.get('code') == ALREADY_EXISTS:
+                    # Linha que nenhuma execução anterior enviou: quem a gravou foi uma tentativa repetida deste lote.
+                    progress.imported += 1
+                else:
+                    batch_failed = True
+                    progress.failed += 1
+                    progress.errors.append((res['id'], res['error']))
+            # Um lote com falha segura o checkpoint: ao retomar ele é reenviado, e o que já entrou volta como
+            # ALREADY_EXISTS.
+            if not batch_failed:
+                done_batches[first_row] = last_row
+        while watermark in done_batches:
+            watermark = done_batches.pop(watermark)
+        save_checkpoint(checkpoint, source, user_id, watermark, run_id, rows_sent)
+
+    def submit(executor, ops, first_row, last_row):
+        nonlocal rows_sent
+        # Linhas abaixo de resent_until podem ter sido gravadas por uma execução anterior interrompida: para elas,
+        # ALREADY_EXISTS quer dizer "já existia". O checkpoint registra o envio antes de o lote sair.
+        resent = {op['id'] for op, row in ops if row < resent_until}
+        rows_sent = max(rows_sent, last_row)
+        save_checkpoint(checkpoint, source, user_id, watermark, run_id, rows_sent)
+        future = executor.submit(client.batch_write, [op for op, _ in ops])
+        pending[future] = (first_row, last_row, resent)
+        # Janela limitada de lotes em voo: a leitura do arquivo espera em vez de acumular linhas na memória.
+        if len(pending) >= parallelism:
+            finished, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            collect(finished)
+            return True
+        return False
+
+    executor = ThreadPoolExecutor(max_workers=parallelism)
+    try:
+        ops = []
+        first_row = None
+        row_number = -1
+        for row_number, row in enumerate(read_rows(source)):
+            progress.rows_read = row_number + 1
+            if row_number < start_row:
+                continue
+            if first_row is None:
+                first_row = row_number
+            try:
+                doc = validate_row(row)
+            except ValueError as e:
+                # +2: cabeçalho na linha 1 e numeração a partir de 1, como a planilha mostra.
+                progress.invalid.append((row_number + 2, str(e)))
+                continue
+            ops.append(({'op': 'create', 'id': import_doc_id(user_id, run_id, row_number),
+                         'fields': {**doc, 'user_id': user_id, 'created_at': created_at}}, row_number))
+            if len(ops) >= batch_size:
+                if submit(executor, ops, first_row, row_number + 1):
+                    yield progress
+                ops, first_row = [], None
+        if ops:
+            submit(executor, ops, first_row, row_number + 1)
+        elif first_row is not None:
+            done_batches[first_row] = row_number + 1
+        while pending:
+            finished, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            collect(finished)
+            yield progress
+        collect([])
+        progress.finished = True
+        if not progress.failed and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        yield progress
+    finally:
+        # Cancelado ou com erro: espera os lotes já enviados para o checkpoint refletir o que foi gravado.
+        executor.shutdown(wait=True)
+        if pending:
+            collect([f for f in list(pending) if f.done() and not f.exception()])
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    from firebase_client import FirebaseClient
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Importa tarefas de um arquivo CSV/XLSX para o usuário informado.")
+    parser.add_argument('arquivo', help='Arquivo .csv ou .xlsx com as colunas titulo, descricao, status, prioridade, due_date.')
+    parser.add_argument('--email', required=True, help='Email do usuário dono das tarefas.')
+    parser.add_argument('--password', help='Senha do usuário (se omitida, será pedida no terminal).')
+    parser.add_argument('--parallel', type=int, default=4, help='Número de lotes gravados em paralelo (padrão: 4).')
+    parser.add_argument('--restart', action='store_true', help='Ignora o checkpoint e recomeça do início do arquivo.')
+    args = parser.parse_args()
+
+    client = FirebaseClient(os.getenv('API_KEY'), os.getenv('PROJECT_ID'), pool_maxsize=max(args.parallel, 4))
+    auth_data = client.sign_in(args.email, args.password or getpass.getpass('Senha: '))
+    if 'idToken' not in auth_data:
+        print(f"\nERRO de login: {auth_data.get('error', {}).get('message', 'Erro desconhecido.')}")
+        exit(1)
+
+    started = time.time()
+    progress = None
+    for progress in iter_import(client, client.local_id, args.arquivo, args.parallel, restart=args.restart):
+        print(f"\r{progress.rows_read} linhas lidas: {progress.summary()}", end='', flush=True)
+    print(f"\n\nConcluído em {time.time() - started:.1f} s.")
+    for line, reason in progress.invalid[:20]:
+        print(f"  Linha {line}: {reason}")
+    for doc_id, error in progress.errors[:20]:
+        print(f"  {doc_id}: {error}")
@@ -1,30 +1,101 @@
 import sys
 import os
+import time
+import logging
+import importlib
+
+# Marcos da inicialização (import, criação e primeira pintura da janela), mostrados com --profile-startup.
+PROFILE_STARTUP = '--profile-startup' in sys.argv
+STARTUP_MARKS = [('início', time.perf_counter())]
+
+
+def mark_startup(label):
+    STARTUP_MARKS.append((label, time.perf_counter()))
+
+
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
-                             QLineEdit, QPushButton, QTextEdit, QListWidget, QListWidgetItem,
-                             QMessageBox, QComboBox, QFileDialog, QDialog, QDialogButtonBox)
-from PyQt5.QtCore import Qt
-import pandas as pd
+                             QLineEdit, QPushButton, QTextEdit, QTableView, QHeaderView,
+                             QMessageBox, QComboBox, QFileDialog, QDialog, QDialogButtonBox,
+                             QAbstractItemView, QProgressBar, QCheckBox, QTableWidget, QTableWidgetItem,
+                             QShortcut)
+from PyQt5.QtCore import Qt, QTimer, QModelIndex
+from PyQt5.QtGui import QKeySequence
+mark_startup('import do PyQt5')
 from dotenv import load_dotenv
 load_dotenv()
 
 API_KEY = os.getenv('API_KEY')
 PROJECT_ID = os.getenv('PROJECT_ID')
+AUTH_EMULATOR_HOST = os.getenv('FIREBASE_AUTH_EMULATOR_HOST')
+FIRESTORE_EMULATOR_HOST = os.getenv('FIRESTORE_EMULATOR_HOST')
 SERVICE_ACCOUNT_KEY_PATH = 'serviceAccountKey.json' 
+TASK_PAGE_SIZE = 300
+SEARCH_DEBOUNCE_MS = 200
+IMPORT_PARALLELISM = 4
+STATUS_MESSAGE_MS = 4000
+# Várias alterações seguidas disparam uma única atualização das contagens.
+SUMMARY_DEBOUNCE_MS = 1000
+TASK_CACHE_PATH = os.getenv('TASK_CACHE_PATH', 'tasks_cache.sqlite3')
+# Com FIREBASE_METRICS_LOG=1, cada requisição ao Firebase é registrada no log como uma linha JSON.
+METRICS_LOG = os.getenv('FIREBASE_METRICS_LOG', '') not in ('', '0')
+METRICS_REFRESH_MS = 2000
+# Intervalo da busca automática por alterações feitas em outros dispositivos; 0 desliga.
+AUTO_REFRESH_SECONDS = int(os.getenv('TASK_AUTO_REFRESH_SECONDS', '60'))
+ADMIN_ROLES = ('admin', 'superadmin')
+# Importados em segundo plano depois que a janela de login aparece (leitura/gravação de .xlsx).
+WARMUP_MODULES = ('openpyxl',)
 
 if not API_KEY or not PROJECT_ID:
     print("ERRO: As variáveis de ambiente API_KEY e PROJECT_ID não foram encontradas.")
     print("Verifique se você criou um arquivo .env e o preencheu corretamente.")
     sys.exit(1)
 
-from firebase_client import FirebaseClient
+from firebase_client import FirebaseClient, TaskQuery, TASK_SUMMARY_FIELDS, TASK_DETAIL_FIELDS, task_watermark
+from task_cache import TaskCache
+from workers import TaskRunner
+from task_model import TaskTableModel, TaskFilterProxy, TASK_ROLE, SORT_ROLE, COLUMNS
+from search_index import TaskSearchIndex, RESULT_LIMIT
+from exporter import EXPORT_FORMATS, iter_export, task_pages
+from importer import iter_import, STATUS_VALUES, PRIORITY_VALUES
+mark_startup('import dos módulos do app')
+
+# Filtros e ordenações da lista, executados pelo Firestore (índices em firestore.indexes.json); None = sem filtro.
+STATUS_FILTERS = [('Todos os status', None), ('Abertas', ('pendente', 'em andamento'))] + \
+                 [(value, (value,)) for value in STATUS_VALUES]
+PRIORITY_FILTERS = [('Todas as prioridades', None)] + [(value, (value,)) for value in reversed(PRIORITY_VALUES)]
+# (campo, direção, ranking); sem filtros e em "Mais recentes" vale a lista completa com sincronização incremental.
+SORT_OPTIONS = [
+    ('Mais recentes', None),
+    ('Prazo (com data)', ('due_date', 'asc', False)),
+    ('Prioridade', ('prioridade', 'desc', True)),
+    ('Status', ('status', 'asc', True)),
+]
+
 
-try:
-    from admin_tools import init_admin, create_user as admin_create_user
-    ADMIN_TOOLS_AVAILABLE = True
-except ImportError:
-    ADMIN_TOOLS_AVAILABLE = False
-    print("AVISO: admin_tools.py não encontrado. Funcionalidades de admin estarão desabilitadas.")
+def load_admin_tools():
+    # O admin_tools traz o firebase_admin, o google-cloud-firestore e o gRPC, o import mais pesado do app;
+    # só quem entra como admin paga esse custo, e na thread do login.
+    return importlib.import_module('admin_tools')
+
+
+def warm_up(modules=WARMUP_MODULES):
+    loaded = []
+    for name in modules:
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except ImportError:
+            pass
+    return loaded
+
+
+def startup_report():
+    lines = ['Inicialização (--profile-startup):']
+    start = previous = STARTUP_MARKS[0][1]
+    for label, at in STARTUP_MARKS[1:]:
+        lines.append(f"  {label:<32}{(at - previous) * 1000:8.1f} ms   total {(at - start) * 1000:8.1f} ms")
+        previous = at
+    return '\n'.join(lines)
 
 
 class LoginWindow(QWidget):
@@ -33,8 +104,16 @@ class LoginWindow(QWidget):
         super().__init__()
         self.client = client
         self.main_window = None
+        self.runner = TaskRunner(self)
+        self.on_first_paint = None
         self.init_ui()
 
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.on_first_paint is not None:
+            callback, self.on_first_paint = self.on_first_paint, None
+            callback()
+
     def init_ui(self):
         self.setWindowTitle('ToDo - Login')
         self.setFixedSize(450, 350)
@@ -56,9 +135,9 @@ class LoginWindow(QWidget):
         self.password_input.setEchoMode(QLineEdit.Password)
         v_layout.addWidget(self.password_input)
 
-        login_btn = QPushButton('Entrar')
-        login_btn.clicked.connect(self.login)
-        v_layout.addWidget(login_btn)
+        self.login_btn = QPushButton('Entrar')
+        self.login_btn.clicked.connect(self.login)
+        v_layout.addWidget(self.login_btn)
 
         v_layout.addStretch(1)
         
@@ -72,26 +151,52 @@ class LoginWindow(QWidget):
             QMessageBox.warning(self, 'Erro', 'Email e Senha são obrigatórios.')
             return
 
+        self.login_btn.setEnabled(False)
+        self.login_btn.setText('Entrando...')
+        self.runner.run(self._authenticate, email, senha, key='login',
+                        on_result=self._on_login, on_error=self._on_login_error)
+
+    def _authenticate(self, email, senha):
         auth_data = self.client.sign_in(email, senha)
+        user_role = None
+        admin_error = None
+        if 'idToken' in auth_data:
+            user_role = self.client.get_user_role(auth_data['localId'])
+            if user_role in ADMIN_ROLES:
+                admin_error = self._init_admin()
+        return auth_data, user_role, admin_error
+
+    def _init_admin(self):
+        if not os.path.exists(SERVICE_ACCOUNT_KEY_PATH):
+            return (f"O arquivo '{SERVICE_ACCOUNT_KEY_PATH}' não foi encontrado. "
+                    "Funcionalidades de admin não podem ser ativadas.")
+        try:
+            load_admin_tools().init_admin(SERVICE_ACCOUNT_KEY_PATH)
+        except ImportError as e:
+            return f"Não foi possível carregar o admin_tools ({e}). Funcionalidades de admin não podem ser ativadas."
+        return None
+
+    def _reset_login_button(self):
+        self.login_btn.setEnabled(True)
+        self.login_btn.setText('Entrar')
+
+    def _on_login_error(self, error):
+        self._reset_login_button()
+        QMessageBox.critical(self, 'Erro de Login', f'Não foi possível conectar ao Firebase.\n\nCausa: {error}')
+
+    def _on_login(self, result):
+        self._reset_login_button()
+        auth_data, user_role, admin_error = result
 
         if 'idToken' in auth_data:
-            user_id = auth_data['localId']
-            profile = self.client.get_user_profile(user_id)
-
-            if profile and 'role' in profile:
-                user_role = profile['role']
-                
-                if user_role in ['admin', 'superadmin']:
-                    if not ADMIN_TOOLS_AVAILABLE or not os.path.exists(SERVICE_ACCOUNT_KEY_PATH):
-                        QMessageBox.critical(self, 'Erro de Configuração Admin',
-                                             f"O arquivo '{SERVICE_ACCOUNT_KEY_PATH}' não foi encontrado. "
-                                             "Funcionalidades de admin não podem ser ativadas.")
-                        return
-                    init_admin(SERVICE_ACCOUNT_KEY_PATH)
+            if user_role:
+                if admin_error:
+                    QMessageBox.critical(self, 'Erro de Configuração Admin', admin_error)
+                    return
 
                 QMessageBox.information(self, 'Sucesso', f'Login bem-sucedido como: {user_role.upper()}')
                 self.hide()
-                self.main_window = MainWindow(self.client, user_role)
+                self.main_window = MainWindow(self.client, user_role, self.runner)
                 self.main_window.show()
             else:
                 QMessageBox.critical(self, 'Erro de Perfil', 'Não foi possível obter o perfil do usuário. '
@@ -130,13 +235,76 @@ class RegisterUserDialog(QDialog):
     def get_details(self):
         return self.email.text().strip(), self.password.text(), self.display_name.text().strip()
 
+class MetricsDialog(QDialog):
+    # Painel de diagnóstico: operações ordenadas pelo tempo total gasto, que é o que o usuário sente como lentidão.
+    HEADERS = ['Operação', 'Chamadas', 'Erros', 'Repetições', 'Total (s)', 'Média (ms)', 'p50 (ms)', 'p95 (ms)',
+               'Máx (ms)', 'Enviado (KB)', 'Recebido (KB)']
+
+    def __init__(self, metrics, parent=None):
+        super().__init__(parent)
+        self.metrics = metrics
+        self.setWindowTitle('Métricas do Firebase')
+        self.resize(900, 400)
+        layout = QVBoxLayout(self)
+
+        self.table = QTableWidget(0, len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().hide()
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        for text, slot in [('Copiar JSON', lambda: self.copy(self.metrics.to_json(indent=2))),
+                           ('Copiar Prometheus', lambda: self.copy(self.metrics.to_prometheus())),
+                           ('Zerar', self.reset)]:
+            btn = QPushButton(text)
+            btn.clicked.connect(slot)
+            buttons.addWidget(btn)
+        buttons.addStretch(1)
+        close_btn = QPushButton('Fechar')
+        close_btn.clicked.connect(self.accept)
+        buttons.addWidget(close_btn)
+        layout.addLayout(buttons)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(METRICS_REFRESH_MS)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start()
+        self.refresh()
+
+    def refresh(self):
+        operations = sorted(self.metrics.snapshot()['operations'].items(),
+                            key=lambda item: item[1]['latency_ms']['total'], reverse=True)
+        self.table.setRowCount(len(operations))
+        for row, (name, stats) in enumerate(operations):
+            latency = stats['latency_ms']
+            values = [name, stats['count'], stats['errors'], stats['retries'], f"{latency['total'] / 1000:.1f}",
+                      latency['avg'], latency['p50'], latency['p95'], latency['max'],
+                      f"{stats['request_bytes'] / 1024:.1f}", f"{stats['response_bytes'] / 1024:.1f}"]
+            for col, value in enumerate(values):
+                self.table.setItem(row, col, QTableWidgetItem(str(value)))
+
+    def copy(self, text):
+        QApplication.clipboard().setText(text)
+
+    def reset(self):
+        self.metrics.reset()
+        self.refresh()
+
 class EditDialog(QDialog):
 
-    def __init__(self, task, client: FirebaseClient):
+    # O diálogo só coleta a alteração; a MainWindow aplica na lista na hora e envia ao Firebase em segundo plano.
+    # A lista só traz o resumo da tarefa, então a descrição é buscada (get_task) quando o diálogo abre; o cliente
+    # guarda o detalhe e só volta ao servidor se uma sincronização trouxer uma versão mais nova da tarefa.
+    def __init__(self, task, client: FirebaseClient, runner: TaskRunner):
         super().__init__()
         self.task = task
-        self.client = client
+        self.action = None
+        self.updates = {}
         self.init_ui()
+        runner.run(client.get_task, task['id'], key=f"task-detail-{task['id']}",
+                   on_result=self._on_detail_loaded)
 
     def init_ui(self):
         self.setWindowTitle('Editar Tarefa')
@@ -146,6 +314,9 @@ class EditDialog(QDialog):
         v.addWidget(self.titulo)
         v.addWidget(QLabel('Descrição'))
         self.desc = QTextEdit(self.task.get('descricao'))
+        if 'descricao' not in self.task:
+            self.desc.setPlaceholderText('Carregando descrição...')
+            self.desc.setEnabled(False)
         v.addWidget(self.desc)
         self.status = QComboBox()
         self.status.addItems(['pendente', 'em andamento', 'concluída'])
@@ -166,44 +337,57 @@ class EditDialog(QDialog):
         v.addLayout(button_layout)
         self.setLayout(v)
 
+    def _on_detail_loaded(self, task):
+        if 'error' in task:
+            return
+        self.task = {**self.task, **task}
+        # Não sobrescreve o que o usuário já começou a digitar.
+        if not self.desc.document().isModified():
+            self.desc.setPlainText(task.get('descricao', ''))
+        self.desc.setPlaceholderText('')
+        self.desc.setEnabled(True)
+
     def save(self):
-        updates = {
+        self.updates = {
             'titulo': self.titulo.text(),
-            'descricao': self.desc.toPlainText(),
             'status': self.status.currentText()
         }
-        res = self.client.update_task(self.task['id'], updates)
-        
-        if 'error' in res:
-            error_message = res['error'].get('message', 'Erro desconhecido.')
-            QMessageBox.critical(self, 'Erro ao Atualizar', f'Não foi possível salvar as alterações.\n\nCausa: {error_message}')
-        else:
-            QMessageBox.information(self, 'Sucesso', 'Tarefa atualizada com sucesso.')
-            self.accept()
+        # Se a descrição não chegou a carregar, ela fica fora da atualização para não ser apagada.
+        if self.desc.isEnabled():
+            self.updates['descricao'] = self.desc.toPlainText()
+        if not self.updates['titulo']:
+            QMessageBox.warning(self, 'Erro', 'O título da tarefa é obrigatório.')
+            return
+        self.action = 'update'
+        self.accept()
 
     def delete(self):
         reply = QMessageBox.question(self, 'Confirmar Exclusão', 'Você tem certeza que deseja deletar esta tarefa?',
                                      QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply == QMessageBox.Yes:
-            status_code = self.client.delete_task(self.task['id'])
-            
-            if status_code == 200 or status_code == 204:
-                QMessageBox.information(self, 'Sucesso', 'Tarefa deletada.')
-                self.accept()
-            else:
-                QMessageBox.critical(self, 'Erro ao Deletar', f'Não foi possível deletar a tarefa.\n\nCódigo de status: {status_code}')
+            self.action = 'delete'
+            self.accept()
 
 
 class MainWindow(QWidget):
 
-    def __init__(self, client: FirebaseClient, user_role: str):
+    def __init__(self, client: FirebaseClient, user_role: str, runner: TaskRunner):
         super().__init__()
         self.client = client
+        self.runner = runner
         self.user_id = client.local_id
         self.user_role = user_role
-        self.tasks = []
+        self.incoming_ids = None
+        self.incoming_watermark = 0
+        # Marca d'água do último refresh; enquanto for None, o próximo refresh baixa a lista inteira.
+        self.watermark = None
+        self.pending_creates = set()
+        self.query = None
+        self.query_cursor = None
         self.init_ui()
-        self.load_tasks()
+        self.render_tasks(self.client.cached_tasks(self.user_id))
+        # Mostra o cache local imediatamente e sincroniza com o Firestore logo após a primeira pintura.
+        QTimer.singleShot(0, self.load_tasks)
 
     def init_ui(self):
         self.setWindowTitle('ToDo Desktop App')
@@ -218,22 +402,106 @@ class MainWindow(QWidget):
             top_bar_layout.addWidget(self.register_btn)
 
         self.search_input = QLineEdit()
-        self.search_input.setPlaceholderText('Pesquisar tarefas por título...')
+        self.search_input.setPlaceholderText('Pesquisar tarefas por título ou descrição...')
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.apply_search)
+        self.search_input.textChanged.connect(self.search_timer.start)
         top_bar_layout.addWidget(self.search_input)
         
         refresh_btn = QPushButton('Atualizar Lista')
         refresh_btn.clicked.connect(self.load_tasks)
         top_bar_layout.addWidget(refresh_btn)
 
-        export_btn = QPushButton('Exportar para XLSX')
-        export_btn.clicked.connect(self.export_xlsx)
-        top_bar_layout.addWidget(export_btn)
+        self.import_btn = QPushButton('Importar...')
+        self.import_btn.clicked.connect(self.import_tasks)
+        top_bar_layout.addWidget(self.import_btn)
+
+        self.export_btn = QPushButton('Exportar...')
+        self.export_btn.clicked.connect(self.export_tasks)
+        top_bar_layout.addWidget(self.export_btn)
         
         main_layout.addLayout(top_bar_layout)
 
-        self.list_widget = QListWidget()
-        self.list_widget.itemDoubleClicked.connect(self.edit_task)
-        main_layout.addWidget(self.list_widget)
+        summary_layout = QHBoxLayout()
+        self.summary_label = QLabel('')
+        summary_layout.addWidget(self.summary_label)
+        summary_layout.addStretch(1)
+        self.all_users_check = None
+        if self.user_role in ['admin', 'superadmin']:
+            self.all_users_check = QCheckBox('Todos os usuários')
+            self.all_users_check.toggled.connect(self.load_summary)
+            summary_layout.addWidget(self.all_users_check)
+        self.summary_timer = QTimer(self)
+        self.summary_timer.setSingleShot(True)
+        self.summary_timer.setInterval(SUMMARY_DEBOUNCE_MS)
+        self.summary_timer.timeout.connect(self.load_summary)
+        main_layout.addLayout(summary_layout)
+
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel('Filtrar:'))
+        self.status_filter = QComboBox()
+        self.priority_filter = QComboBox()
+        self.sort_input = QComboBox()
+        for combo, options in ((self.status_filter, STATUS_FILTERS), (self.priority_filter, PRIORITY_FILTERS),
+                               (self.sort_input, SORT_OPTIONS)):
+            for label, data in options:
+                combo.addItem(label, data)
+            combo.currentIndexChanged.connect(self.apply_filters)
+        filter_layout.addWidget(self.status_filter)
+        filter_layout.addWidget(self.priority_filter)
+        filter_layout.addWidget(QLabel('Ordenar por:'))
+        filter_layout.addWidget(self.sort_input)
+        filter_layout.addStretch(1)
+        main_layout.addLayout(filter_layout)
+
+        self.search_index = TaskSearchIndex()
+        self.model = TaskTableModel(self, search_index=self.search_index)
+        self.proxy = TaskFilterProxy(self)
+        self.proxy.setSourceModel(self.model)
+        self.proxy.setSortRole(SORT_ROLE)
+
+        self.task_view = QTableView()
+        self.task_view.setModel(self.proxy)
+        self.task_view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.task_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.task_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.task_view.setSortingEnabled(True)
+        self.task_view.sortByColumn([field for field, _ in COLUMNS].index('created_at'), Qt.DescendingOrder)
+        self.task_view.setWordWrap(False)
+        # Linhas de altura fixa deixam a view calcular a rolagem sem medir cada linha.
+        self.task_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.task_view.verticalHeader().hide()
+        self.task_view.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.task_view.horizontalHeader().setStretchLastSection(False)
+        self.task_view.horizontalHeader().setSectionResizeMode([field for field, _ in COLUMNS].index('titulo'), QHeaderView.Stretch)
+        self.task_view.doubleClicked.connect(self.edit_task)
+        main_layout.addWidget(self.task_view)
+
+        self.empty_label = QLabel("Nenhuma tarefa encontrada.")
+        self.empty_label.hide()
+        main_layout.addWidget(self.empty_label)
+
+        self.load_more_btn = QPushButton('Carregar mais')
+        self.load_more_btn.clicked.connect(lambda: self.load_filtered(more=True))
+        self.load_more_btn.hide()
+        main_layout.addWidget(self.load_more_btn)
+
+        bulk_layout = QHBoxLayout()
+        bulk_layout.addWidget(QLabel('Selecionadas:'))
+        self.bulk_status_input = QComboBox()
+        self.bulk_status_input.addItems(['pendente', 'em andamento', 'concluída'])
+        bulk_layout.addWidget(self.bulk_status_input)
+        bulk_status_btn = QPushButton('Alterar Status')
+        bulk_status_btn.clicked.connect(self.bulk_change_status)
+        bulk_layout.addWidget(bulk_status_btn)
+        bulk_delete_btn = QPushButton('Deletar Selecionadas')
+        bulk_delete_btn.setStyleSheet("background-color: #ff4d4d; color: white;")
+        bulk_delete_btn.clicked.connect(self.bulk_delete)
+        bulk_layout.addWidget(bulk_delete_btn)
+        bulk_layout.addStretch(1)
+        main_layout.addLayout(bulk_layout)
 
         form_layout = QHBoxLayout()
         left_form = QVBoxLayout()
@@ -260,19 +528,241 @@ class MainWindow(QWidget):
         form_layout.addLayout(right_form)
 
         main_layout.addLayout(form_layout)
+
+        status_layout = QHBoxLayout()
+        self.status_label = QLabel('')
+        status_layout.addWidget(self.status_label)
+        self.status_timer = QTimer(self)
+        self.status_timer.setSingleShot(True)
+        self.status_timer.setInterval(STATUS_MESSAGE_MS)
+        self.status_timer.timeout.connect(lambda: self.status_label.setText(''))
+        status_layout.addStretch(1)
+        self.metrics_btn = QPushButton('')
+        self.metrics_btn.setFlat(True)
+        self.metrics_btn.setToolTip('Métricas das chamadas ao Firebase (F12)')
+        self.metrics_btn.clicked.connect(self.open_metrics)
+        status_layout.addWidget(self.metrics_btn)
+        QShortcut(QKeySequence('F12'), self, self.open_metrics)
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.setInterval(METRICS_REFRESH_MS)
+        self.metrics_timer.timeout.connect(self.update_metrics_summary)
+        self.metrics_timer.start()
+        self.busy_bar = QProgressBar()
+        self.busy_bar.setRange(0, 0)
+        self.busy_bar.setMaximumWidth(150)
+        self.busy_bar.hide()
+        status_layout.addWidget(self.busy_bar)
+        self.cancel_btn = QPushButton('Cancelar')
+        self.cancel_btn.clicked.connect(self.cancel_long_job)
+        self.cancel_btn.hide()
+        status_layout.addWidget(self.cancel_btn)
+        self.cancel_key = None
+        main_layout.addLayout(status_layout)
+        if AUTO_REFRESH_SECONDS > 0:
+            self.auto_refresh_timer = QTimer(self)
+            self.auto_refresh_timer.setInterval(AUTO_REFRESH_SECONDS * 1000)
+            self.auto_refresh_timer.timeout.connect(self.auto_refresh)
+            self.auto_refresh_timer.start()
+        self.runner.pending_changed.connect(self.on_pending_changed)
+
         self.setLayout(main_layout)
 
+    def closeEvent(self, event):
+        self.runner.cancel('refresh')
+        super().closeEvent(event)
+
+    def on_pending_changed(self, pending):
+        self.busy_bar.setVisible(pending > 0)
+
+    def update_metrics_summary(self):
+        operations = self.client.metrics.snapshot()['operations']
+        if not operations:
+            self.metrics_btn.setText('')
+            return
+        calls = sum(stats['count'] for stats in operations.values())
+        errors = sum(stats['errors'] for stats in operations.values())
+        slowest, stats = max(operations.items(), key=lambda item: item[1]['latency_ms']['total'])
+        self.metrics_btn.setText(f"{calls} req · {errors} erros · {slowest}: p95 {stats['latency_ms']['p95']:.0f} ms")
+
+    def open_metrics(self):
+        MetricsDialog(self.client.metrics, self).exec_()
+
+    def notify(self, text):
+        self.status_label.setText(text)
+        self.status_timer.start()
+
+    def render_tasks(self, tasks):
+        self.model.set_tasks(tasks)
+        self.update_empty_label()
+
+    def update_empty_label(self):
+        self.empty_label.setVisible(self.proxy.rowCount() == 0)
+
     def load_tasks(self):
-        self.list_widget.clear()
-        self.tasks = self.client.list_tasks(self.user_id)
-        if not self.tasks:
-            self.list_widget.addItem("Nenhuma tarefa encontrada.")
+        if self.query is not None:
+            self.load_filtered()
+            return
+        # Depois da primeira carga completa, só as alterações desde a marca d'água são baixadas.
+        if self.watermark is not None:
+            self.sync_changes()
+            return
+        # Um novo refresh cancela o anterior; páginas atrasadas da busca antiga são descartadas.
+        self.incoming_ids = set()
+        self.incoming_watermark = 0
+        self.notify('Sincronizando tarefas...')
+        self.runner.run(self.client.iter_task_pages, self.user_id, page_size=TASK_PAGE_SIZE,
+                        fields=TASK_SUMMARY_FIELDS, key='refresh',
+                        on_progress=self._on_task_page, on_result=self._on_tasks_loaded, on_error=self._on_load_error)
+
+    def _on_task_page(self, page):
+        # Cada página é mesclada por id assim que chega; linhas inalteradas não são tocadas.
+        self.incoming_ids.update(t['id'] for t in page)
+        self.incoming_watermark = task_watermark(page, self.incoming_watermark)
+        self.model.upsert(page, merge=True)
+        if self.search_input.text():
+            self.apply_search()
+        self.update_empty_label()
+        self.notify(f'Sincronizando tarefas... {len(self.incoming_ids)} carregadas')
+
+    def _on_tasks_loaded(self, _):
+        # Tarefas criadas otimisticamente podem ainda não ter chegado ao servidor quando o refresh terminou.
+        keep = self.incoming_ids | self.pending_creates
+        self.model.remove([t['id'] for t in self.model.tasks() if t['id'] not in keep])
+        self.notify(f'{len(self.incoming_ids)} tarefas sincronizadas.')
+        self.incoming_ids = None
+        self.watermark = self.incoming_watermark
+        self.update_empty_label()
+        self.summary_timer.start()
+        self.load_descriptions()
+
+    def sync_changes(self, quiet=False):
+        if not quiet:
+            self.notify('Buscando alterações...')
+        self.runner.run(self.client.list_tasks_changed_since, self.user_id, self.watermark,
+                        fields=TASK_SUMMARY_FIELDS, key='refresh',
+                        on_result=lambda res: self._on_changes_loaded(res, quiet),
+                        on_error=(lambda e: None) if quiet else self._on_load_error)
+
+    def auto_refresh(self):
+        # Não interrompe a carga completa inicial nem um refresh já em andamento.
+        if self.watermark is None or self.incoming_ids is not None or self.runner.is_running('refresh'):
             return
+        self.sync_changes(quiet=True)
+
+    def _on_changes_loaded(self, result, quiet):
+        changed, deleted, self.watermark = result
+        if changed:
+            self.model.upsert(changed, merge=True)
+        if deleted:
+            self.model.remove(deleted)
+        if changed or deleted:
+            if self.search_input.text():
+                self.apply_search()
+            self.update_empty_label()
+            self.summary_timer.start()
+            self.load_descriptions()
+        if changed or deleted or not quiet:
+            self.notify(f'{len(changed)} tarefas alteradas e {len(deleted)} removidas desde a última sincronização.')
+
+    def current_query(self):
+        # None quando não há filtro nem ordenação: aí vale a lista completa com sincronização incremental.
+        statuses = self.status_filter.currentData()
+        priorities = self.priority_filter.currentData()
+        sort = self.sort_input.currentData()
+        if statuses is None and priorities is None and sort is None:
+            return None
+        query = TaskQuery(self.user_id).select(TASK_SUMMARY_FIELDS).limit(TASK_PAGE_SIZE)
+        for field, values in (('status', statuses), ('prioridade', priorities)):
+            if values and len(values) == 1:
+                query = query.where(field, '==', values[0])
+            elif values:
+                query = query.where(field, 'in', list(values))
+        if sort is not None:
+            field, direction, ranked = sort
+            if field == 'due_date':
+                # due_date vazio viria antes de todas as datas; "Prazo" lista só as tarefas que têm uma.
+                query = query.where('due_date', '>', '')
+            query = query.order_by(field, direction, ranked)
+        return query
+
+    def apply_filters(self):
+        self.query = self.current_query()
+        self.query_cursor = None
+        self.load_more_btn.hide()
+        # A view ordena as linhas carregadas pela mesma chave usada pelo servidor para escolher quais carregar.
+        sort = self.sort_input.currentData()
+        field, direction = sort[:2] if sort else ('created_at', 'desc')
+        self.task_view.sortByColumn([f for f, _ in COLUMNS].index(field),
+                                    Qt.DescendingOrder if direction == 'desc' else Qt.AscendingOrder)
+        # Com filtro a lista deixa de ser completa: ao voltar para "todos", é preciso uma nova carga completa.
+        self.watermark = None
+        if self.query is None:
+            self.render_tasks(self.client.cached_tasks(self.user_id))
+        self.load_tasks()
+
+    def load_filtered(self, more=False):
+        self.notify('Buscando tarefas...')
+        self.runner.run(self.client.run_task_query, self.query, self.query_cursor if more else None, key='refresh',
+                        on_result=lambda result: self._on_filtered_loaded(result, more), on_error=self._on_load_error)
+
+    def _on_filtered_loaded(self, result, more):
+        tasks, self.query_cursor = result
+        if more:
+            self.model.upsert(tasks, merge=True)
+        else:
+            self.model.set_tasks(tasks, merge=True)
+        if self.search_input.text():
+            self.apply_search()
+        self.update_empty_label()
+        self.load_more_btn.setVisible(self.query_cursor is not None)
+        self.load_descriptions()
+        self.notify(f'{self.model.rowCount()} tarefas carregadas' +
+                    ('; há mais resultados.' if self.query_cursor is not None else '.'))
+
+    def load_descriptions(self):
+        # A lista vem sem descrição (TASK_SUMMARY_FIELDS) para aparecer rápido; para a busca por descrição, as que
+        # faltam (tarefas novas ou alteradas desde a última vez) são buscadas depois, em segundo plano.
+        missing = [t['id'] for t in self.model.tasks() if 'descricao' not in t]
+        if missing:
+            self.runner.run(self.client.get_tasks, missing, TASK_DETAIL_FIELDS, key='descriptions',
+                            on_result=self._on_descriptions_loaded, on_error=lambda e: None, background=True)
+
+    def _on_descriptions_loaded(self, tasks):
+        # Só completa linhas que ainda estão na lista, sem descrição e sem versão mais nova que a buscada.
+        complete = []
+        for task in tasks:
+            row = self.model.task_by_id(task['id'])
+            if row is not None and 'descricao' not in row and \
+                    (task.get('updated_at') or 0) >= (row.get('updated_at') or 0):
+                complete.append(task)
+        self.model.upsert(complete, merge=True)
+        if self.search_input.text():
+            self.apply_search()
+
+    def _on_load_error(self, error):
+        QMessageBox.warning(self, 'Sem Conexão', 'Não foi possível sincronizar com o Firebase. '
+                            f'Exibindo as tarefas salvas localmente.\n\nCausa: {error}')
 
-        for t in self.tasks:
-            item = QListWidgetItem(f"[{t.get('status', 'N/A').upper()}] {t.get('titulo', 'Sem Título')}")
-            item.setData(Qt.UserRole, t)
-            self.list_widget.addItem(item)
+    def load_summary(self):
+        # Contagens feitas pelo Firestore (runAggregationQuery): nenhum documento é baixado.
+        all_users = self.all_users_check is not None and self.all_users_check.isChecked()
+        self.runner.run(self.client.count_tasks_by, None if all_users else self.user_id,
+                        {'status': STATUS_VALUES, 'prioridade': PRIORITY_VALUES}, key='summary',
+                        on_result=lambda summary: self._on_summary_loaded(summary, all_users),
+                        on_error=lambda e: self.summary_label.setText('Resumo indisponível sem conexão.'))
+
+    def _on_summary_loaded(self, summary, all_users):
+        by_status = ' · '.join(f"{value}: {summary['status'].get(value, 0)}" for value in STATUS_VALUES)
+        by_priority = ' · '.join(f"{value}: {summary['prioridade'].get(value, 0)}" for value in reversed(PRIORITY_VALUES))
+        scope = 'Todos os usuários — ' if all_users else ''
+        self.summary_label.setText(f"{scope}Total: {summary['total']}   |   {by_status}   |   {by_priority}")
+
+    def apply_search(self):
+        matches = self.search_index.search(self.search_input.text(), RESULT_LIMIT)
+        self.proxy.set_matches(matches)
+        self.update_empty_label()
+        if matches is not None and len(matches) >= RESULT_LIMIT:
+            self.notify(f'Mostrando as primeiras {RESULT_LIMIT} tarefas encontradas; refine a busca para ver as demais.')
 
     def create_task(self):
         titulo = self.titulo_input.text()
@@ -287,35 +777,196 @@ class MainWindow(QWidget):
             'prioridade': self.prio_input.currentText(),
             'due_date': ''
         }
-        self.client.create_task(self.user_id, doc)
-        QMessageBox.information(self, 'Sucesso', 'Nova tarefa criada.')
+        # O id é gerado aqui para a linha otimista já ser a definitiva quando o Firebase confirmar.
+        task_id = self.client.new_task_id()
+        self.pending_creates.add(task_id)
+        self.apply_local([{**doc, 'id': task_id, 'user_id': self.user_id, 'created_at': int(time.time())}])
         # Limpa os campos do formulário
         self.titulo_input.clear()
         self.desc_input.clear()
-        self.load_tasks()
+        self.runner.run(self.client.create_task, self.user_id, doc, task_id,
+                        on_result=lambda res: self._on_create_done(task_id, res),
+                        on_error=lambda e: self._on_create_done(task_id, {'error': {'message': str(e)}}))
+
+    def _on_create_done(self, task_id, res):
+        self.pending_creates.discard(task_id)
+        self._on_write_done(res, rollback=lambda: self.remove_local([task_id]), success='Nova tarefa criada.')
+
+    def apply_local(self, tasks, merge=False):
+        self.model.upsert(tasks, merge)
+        if self.search_input.text():
+            self.apply_search()
+        self.update_empty_label()
+
+    def remove_local(self, task_ids):
+        self.model.remove(task_ids)
+        self.update_empty_label()
+
+    def _on_write_done(self, res, rollback, success):
+        if isinstance(res, dict) and 'error' in res:
+            self._on_write_failed(res['error'].get('message', 'Erro desconhecido.'), rollback)
+            return
+        if isinstance(res, int) and res not in (200, 204):
+            self._on_write_failed(f'Código de status: {res}', rollback)
+            return
+        if isinstance(res, dict) and 'id' in res:
+            # A resposta do commit pode trazer só os campos gravados e o updated_at do servidor.
+            self.apply_local([res], merge=True)
+        self.notify(success)
+        self.summary_timer.start()
+
+    def _on_write_failed(self, error, rollback):
+        rollback()
+        QMessageBox.warning(self, 'Alteração Desfeita', f'O Firebase recusou a alteração e ela foi desfeita.\n\nCausa: {error}')
 
-    def edit_task(self, item: QListWidgetItem):
-        task_data = item.data(Qt.UserRole)
+    def edit_task(self, index: QModelIndex):
+        task_data = index.data(TASK_ROLE)
         if not task_data:
             return
             
-        dialog = EditDialog(task_data, self.client)
-        dialog.exec_()
-        self.load_tasks() 
+        dialog = EditDialog(task_data, self.client, self.runner)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        task_data = dialog.task
+        task_id = task_data['id']
+        restore = lambda: self.apply_local([task_data])
+        if dialog.action == 'update':
+            self.apply_local([{**task_data, **dialog.updates}])
+            self.runner.run(self.client.update_task, task_id, dialog.updates,
+                            on_result=lambda res: self._on_write_done(res, restore, 'Tarefa atualizada.'),
+                            on_error=lambda e: self._on_write_failed(e, restore))
+        elif dialog.action == 'delete':
+            self.remove_local([task_id])
+            self.runner.run(self.client.delete_task, task_id,
+                            on_result=lambda res: self._on_write_done(res, restore, 'Tarefa deletada.'),
+                            on_error=lambda e: self._on_write_failed(e, restore))
+
+    def selected_tasks(self):
+        return [index.data(TASK_ROLE) for index in self.task_view.selectionModel().selectedRows()]
+
+    def _on_bulk_done(self, action, results, originals):
+        failed = [r for r in results if not r['ok']]
+        # Só as tarefas recusadas voltam ao estado anterior; as demais ficam como já estão na tela.
+        self.apply_local([originals[r['id']] for r in failed if r['id'] in originals])
+        if failed:
+            details = '\n'.join(f"{r['id']}: {r['error']}" for r in failed[:10])
+            QMessageBox.warning(self, f'{action} Parcial',
+                                f'{len(results) - len(failed)} de {len(results)} tarefas processadas. '
+                                f'As demais foram desfeitas.\n\nFalhas:\n{details}')
+        else:
+            self.notify(f'{len(results)} tarefas processadas.')
+        self.summary_timer.start()
+
+    def _on_bulk_failed(self, error, originals):
+        self.apply_local(list(originals.values()))
+        QMessageBox.warning(self, 'Alteração Desfeita', f'Não foi possível falar com o Firebase e as alterações foram desfeitas.\n\nCausa: {error}')
+
+    def bulk_change_status(self):
+        tasks = self.selected_tasks()
+        if not tasks:
+            QMessageBox.warning(self, 'Alterar Status', 'Selecione ao menos uma tarefa.')
+            return
+        updates = {'status': self.bulk_status_input.currentText()}
+        originals = {t['id']: t for t in tasks}
+        self.apply_local([{**t, **updates} for t in tasks])
+        self.runner.run(self.client.bulk_update_tasks, list(originals), updates,
+                        on_result=lambda results: self._on_bulk_done('Alteração', results, originals),
+                        on_error=lambda e: self._on_bulk_failed(e, originals))
 
-    def export_xlsx(self):
-        if not self.tasks:
+    def bulk_delete(self):
+        tasks = self.selected_tasks()
+        if not tasks:
+            QMessageBox.warning(self, 'Deletar', 'Selecione ao menos uma tarefa.')
+            return
+        reply = QMessageBox.question(self, 'Confirmar Exclusão', f'Você tem certeza que deseja deletar {len(tasks)} tarefas?',
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        originals = {t['id']: t for t in tasks}
+        self.remove_local(list(originals))
+        self.runner.run(self.client.bulk_delete_tasks, list(originals),
+                        on_result=lambda results: self._on_bulk_done('Exclusão', results, originals),
+                        on_error=lambda e: self._on_bulk_failed(e, originals))
+
+    def export_tasks(self):
+        if not self.model.tasks():
             QMessageBox.warning(self, 'Exportar', 'Não há tarefas para exportar.')
             return
 
-        df = pd.DataFrame(self.tasks)
-        fname, _ = QFileDialog.getSaveFileName(self, 'Salvar Arquivo XLSX', os.getcwd(), 'Excel Files (*.xlsx)')
-        if fname:
-            try:
-                df.to_excel(fname, index=False)
-                QMessageBox.information(self, 'Exportado com Sucesso', f'Arquivo salvo em: {fname}')
-            except Exception as e:
-                QMessageBox.critical(self, 'Erro ao Exportar', str(e))
+        fname, selected = QFileDialog.getSaveFileName(self, 'Exportar Tarefas', os.getcwd(), ';;'.join(EXPORT_FORMATS.values()))
+        if not fname:
+            return
+        if not os.path.splitext(fname)[1]:
+            fname += next(ext for ext, label in EXPORT_FORMATS.items() if label == selected)
+        # A lista da tela só tem o resumo das tarefas; a exportação lê os documentos completos, página a página,
+        # direto para o arquivo, então a memória usada não depende do total de tarefas.
+        self.notify('Exportando...')
+        self.show_cancel('export')
+        self.runner.run(lambda: iter_export(task_pages(self.client, self.user_id, TASK_PAGE_SIZE), fname), key='export',
+                        on_progress=lambda written: self.notify(f'Exportando... {written} tarefas'),
+                        on_result=lambda _: self._on_export_done(fname),
+                        on_error=self._on_export_failed, background=True)
+
+    def show_cancel(self, key):
+        # Importação e exportação não rodam juntas: o botão Cancelar e a cancel_key valem para um trabalho só.
+        self.cancel_key = key
+        self.cancel_btn.show()
+        self.import_btn.setEnabled(False)
+        self.export_btn.setEnabled(False)
+
+    def hide_cancel(self):
+        self.cancel_key = None
+        self.cancel_btn.hide()
+        self.import_btn.setEnabled(True)
+        self.export_btn.setEnabled(True)
+
+    def cancel_long_job(self):
+        if self.cancel_key:
+            self.runner.cancel(self.cancel_key)
+        self.hide_cancel()
+        self.notify('Operação cancelada.')
+
+    def _on_export_done(self, fname):
+        self.hide_cancel()
+        QMessageBox.information(self, 'Exportado com Sucesso', f'Arquivo salvo em: {fname}')
+
+    def _on_export_failed(self, error):
+        self.hide_cancel()
+        QMessageBox.critical(self, 'Erro ao Exportar', str(error))
+
+    def import_tasks(self):
+        fname, _ = QFileDialog.getOpenFileName(self, 'Importar Tarefas', os.getcwd(), 'Planilhas (*.csv *.xlsx)')
+        if not fname:
+            return
+        # Um import interrompido continua do checkpoint na próxima vez que o mesmo arquivo for escolhido.
+        self.import_progress = None
+        self.notify('Importando...')
+        self.show_cancel('import')
+        self.runner.run(iter_import, self.client, self.user_id, fname, IMPORT_PARALLELISM, key='import',
+                        on_progress=self._on_import_progress,
+                        on_result=lambda _: self._on_import_done(),
+                        on_error=self._on_import_failed, background=True)
+
+    def _on_import_progress(self, progress):
+        self.import_progress = progress
+        self.notify(f'Importando... {progress.rows_read} linhas lidas: {progress.summary()}')
+
+    def _on_import_done(self):
+        self.hide_cancel()
+        progress = self.import_progress
+        if progress is None:
+            return
+        details = '\n'.join(f'Linha {line}: {reason}' for line, reason in progress.invalid[:10])
+        if progress.failed:
+            details += '\n\nAlgumas tarefas falharam; importe o mesmo arquivo novamente para continuar de onde parou.'
+        QMessageBox.information(self, 'Importação Concluída', f'{progress.summary()}.\n\n{details}'.strip())
+        self.load_tasks()
+
+    def _on_import_failed(self, error):
+        self.hide_cancel()
+        QMessageBox.critical(self, 'Erro ao Importar', f'A importação foi interrompida; importe o mesmo arquivo '
+                             f'novamente para continuar de onde parou.\n\nCausa: {error}')
+        self.load_tasks()
 
     def open_register_user_dialog(self):
         dialog = RegisterUserDialog(self)
@@ -325,15 +976,16 @@ class MainWindow(QWidget):
                 QMessageBox.warning(self, 'Campos Vazios', 'Todos os campos são obrigatórios para criar um usuário.')
                 return
             
-            try:
-                new_user = admin_create_user(email, password, name)
-                QMessageBox.information(self, 'Sucesso', f'Usuário criado com sucesso!\nEmail: {email}\nUID: {new_user.uid}')
-            except Exception as e:
-                QMessageBox.critical(self, 'Erro ao Criar Usuário', f'Não foi possível criar o usuário.\n\nFirebase error: {e}')
+            self.runner.run(load_admin_tools().create_user, email, password, name,
+                            on_result=lambda new_user: QMessageBox.information(
+                                self, 'Sucesso', f'Usuário criado com sucesso!\nEmail: {email}\nUID: {new_user.uid}'),
+                            on_error=lambda e: QMessageBox.critical(
+                                self, 'Erro ao Criar Usuário', f'Não foi possível criar o usuário.\n\nFirebase error: {e}'))
 
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
+    mark_startup('QApplication')
     
     app.setStyleSheet("""
         QWidget {
@@ -362,7 +1014,7 @@ if __name__ == '__main__':
             border-radius: 4px;
             min-height: 28px; /* Adicionado altura mínima para LineEdit e ComboBox */
         }
-        QListWidget {
+        QTableView {
             background-color: #3c3c3c;
             border: 1px solid #666;
             border-radius: 4px;
@@ -375,7 +1027,29 @@ if __name__ == '__main__':
         }
     """)
     
-    client = FirebaseClient(API_KEY, PROJECT_ID)
+    if AUTH_EMULATOR_HOST and FIRESTORE_EMULATOR_HOST:
+        client = FirebaseClient.for_emulator(API_KEY, PROJECT_ID, AUTH_EMULATOR_HOST, FIRESTORE_EMULATOR_HOST,
+                                             cache=TaskCache(TASK_CACHE_PATH))
+    else:
+        client = FirebaseClient(API_KEY, PROJECT_ID, cache=TaskCache(TASK_CACHE_PATH))
+    if METRICS_LOG:
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(message)s')
+        client.metrics.enable_logging()
+    mark_startup('cliente e cache local')
     login = LoginWindow(client)
+    mark_startup('janela de login criada')
+
+    def on_warmed_up(loaded):
+        mark_startup(f"aquecimento ({', '.join(loaded) or 'nada'})")
+        if PROFILE_STARTUP:
+            print(startup_report())
+            app.quit()
+
+    def on_first_paint():
+        mark_startup('primeira pintura do login')
+        # Só depois da janela visível: o aquecimento não atrasa a primeira pintura.
+        login.runner.run(warm_up, on_result=on_warmed_up, on_error=lambda e: on_warmed_up([]))
+
+    login.on_first_paint = on_first_paint
     login.show()
     sys.exit(app.exec_())
\ No newline at end of file
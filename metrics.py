@@ -0,0 +1,142 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+# Limites superiores (em segundos) dos buckets de latência, no formato dos histogramas do Prometheus.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float('inf'))
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, q):
+        # Aproximação pelo limite superior do bucket; o último bucket (infinito) devolve o máximo observado.
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+class OperationStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.statuses = defaultdict(int)
+        self.errors = 0
+        self.retries = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def snapshot(self):
+        latency = self.latency
+        return {
+            'count': latency.count,
+            'errors': self.errors,
+            'retries': self.retries,
+            'statuses': dict(self.statuses),
+            'latency_ms': {
+                'total': round(latency.sum * 1000, 1),
+                'avg': round(latency.sum / latency.count * 1000, 1) if latency.count else 0.0,
+                'p50': round(latency.percentile(0.5) * 1000, 1),
+                'p95': round(latency.percentile(0.95) * 1000, 1),
+                'max': round(latency.max * 1000, 1),
+            },
+            'request_bytes': self.request_bytes,
+            'response_bytes': self.response_bytes,
+        }
+
+
+class ClientMetrics:
+    # Métricas em memória por operação do cliente (create_task, list_tasks, ...). Cada chamada HTTP, já com as
+    # repetições do resilience, vira um registro; os hooks recebem o registro cru (ex.: log estruturado).
+    def __init__(self):
+        self.operations = defaultdict(OperationStats)
+        self.hooks = []
+        self.started_at = time.time()
+        self.lock = threading.Lock()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def enable_logging(self, logger=None, level=logging.INFO):
+        logger = logger or logging.getLogger('firebase_client')
+        self.add_hook(lambda record: logger.log(level, json.dumps(record, ensure_ascii=False)))
+
+    def record(self, operation, status, latency, request_bytes=0, response_bytes=0, retries=0, error=None):
+        # status None = a chamada terminou em exceção (sem conexão, circuito aberto...).
+        with self.lock:
+            stats = self.operations[operation]
+            stats.latency.observe(latency)
+            stats.statuses[str(status) if status is not None else 'exception'] += 1
+            if status is None or status >= 400:
+                stats.errors += 1
+            stats.retries += retries
+            stats.request_bytes += request_bytes
+            stats.response_bytes += response_bytes
+        if self.hooks:
+            record = {'ts': round(time.time(), 3), 'operation': operation, 'status': status,
+                      'latency_ms': round(latency * 1000, 1), 'request_bytes': request_bytes,
+                      'response_bytes': response_bytes, 'retries': retries}
+            if error is not None:
+                record['error'] = error
+            for hook in self.hooks:
+                hook(record)
+
+    def reset(self):
+        with self.lock:
+            self.operations.clear()
+            self.started_at = time.time()
+
+    def snapshot(self):
+        with self.lock:
+            return {'since': self.started_at,
+                    'operations': {name: stats.snapshot() for name, stats in sorted(self.operations.items())}}
+
+    def to_json(self, indent=None):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=indent)
+
+    def to_prometheus(self, prefix='firebase_client'):
+        lines = [
+            f'# HELP {prefix}_request_duration_seconds Latência por operação, incluindo repetições.',
+            f'# TYPE {prefix}_request_duration_seconds histogram',
+        ]
+        counters = []
+        with self.lock:
+            for name, stats in sorted(self.operations.items()):
+                label = f'operation="{name}"'
+                cumulative = 0
+                for bound, n in zip(stats.latency.buckets, stats.latency.counts):
+                    cumulative += n
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{prefix}_request_duration_seconds_bucket{{{label},le="{le}"}} {cumulative}')
+                lines.append(f'{prefix}_request_duration_seconds_sum{{{label}}} {stats.latency.sum}')
+                lines.append(f'{prefix}_request_duration_seconds_count{{{label}}} {stats.latency.count}')
+                for status, n in sorted(stats.statuses.items()):
+                    counters.append(('requests_total', f'{label},status="{status}"', n))
+                counters.append(('retries_total', label, stats.retries))
+                counters.append(('request_bytes_total', label, stats.request_bytes))
+                counters.append(('response_bytes_total', label, stats.response_bytes))
+        for metric in ('requests_total', 'retries_total', 'request_bytes_total', 'response_bytes_total'):
+            lines.append(f'# TYPE {prefix}_{metric} counter')
+            lines.extend(f'{prefix}_{metric}{{{labels}}} {value}' for name, labels, value in counters if name == metric)
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,174 @@
+import asyncio
+import math
+import random
+import threading
+import time
+
+# Cota estourada (RESOURCE_EXHAUSTED) ou servidor sobrecarregado (UNAVAILABLE): a requisição não foi processada,
+# então pode ser repetida mesmo quando não é idempotente, e o limitador reduz a concorrência.
+THROTTLE_STATUS = frozenset({429, 503})
+# Falhas transitórias em que a requisição pode ter sido aplicada: só são repetidas em chamadas idempotentes.
+TRANSIENT_STATUS = frozenset({500, 502, 504})
+IDEMPOTENT_METHODS = frozenset({'GET', 'PUT', 'PATCH', 'DELETE'})
+
+
+class CircuitOpenError(ConnectionError):
+    # Subclasse de ConnectionError: quem já trata falta de rede (fallback para o cache etc.) trata isto também.
+    def __init__(self, retry_in):
+        self.retry_in = retry_in
+        super().__init__(f"Servidor indisponível. Nova tentativa em {math.ceil(retry_in)} s.")
+
+
+def retry_after(headers):
+    value = headers.get('Retry-After') if headers else None
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    # Backoff exponencial com jitter total e um orçamento de repetições compartilhado pelo cliente (como o retry
+    # throttling do gRPC): cada falha transitória gasta um token, cada sucesso devolve uma fração, e abaixo da
+    # metade do orçamento ninguém repete. Com o servidor fora do ar as repetições param em vez de multiplicar a carga.
+    def __init__(self, max_retries=4, base_delay=0.25, max_delay=8.0, budget=20, budget_ratio=0.1):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.budget_ratio = budget_ratio
+        self.tokens = float(budget)
+        self.lock = threading.Lock()
+
+    def should_retry(self, attempt, status, idempotent):
+        # status None = erro de conexão ou timeout, sem resposta.
+        transient = status is None or status in THROTTLE_STATUS or status in TRANSIENT_STATUS
+        with self.lock:
+            if not transient:
+                self.tokens = min(self.budget, self.tokens + self.budget_ratio)
+                return False
+            self.tokens = max(self.tokens - 1, 0.0)
+            within_budget = self.tokens > self.budget / 2
+        if attempt >= self.max_retries or not within_budget:
+            return False
+        return idempotent or status in THROTTLE_STATUS
+
+    def delay(self, attempt, server_delay=None):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, server_delay) if server_delay is not None else delay
+
+
+class CircuitBreaker:
+    # Depois de failure_threshold falhas seguidas do servidor (5xx ou sem conexão) as chamadas falham na hora
+    # durante reset_timeout; então uma única requisição de teste decide se o circuito fecha ou abre de novo.
+    # 429 não conta: o servidor está respondendo, só pediu calma.
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if self.probing or time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def before_request(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            waited = time.monotonic() - self.opened_at
+            if waited < self.reset_timeout or self.probing:
+                raise CircuitOpenError(max(self.reset_timeout - waited, 0))
+            self.probing = True
+
+    def abandon(self):
+        # A tentativa terminou sem resultado (ex.: cancelada): libera a vaga da requisição de teste sem contar
+        # sucesso nem falha, para a próxima chamada poder testar o servidor.
+        with self.lock:
+            self.probing = False
+
+    def record(self, status):
+        if status is None or status >= 500:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+
+class AimdLimit:
+    # Limite de requisições simultâneas no estilo AIMD do TCP: cada sucesso soma 1/limite (≈ +1 a cada "janela"
+    # de respostas) e cada 429/503 corta pela metade, no máximo uma vez por cooldown para que uma rajada de
+    # respostas da mesma janela não derrube o limite até o mínimo. Assim a vazão converge para o que a cota permite.
+    def __init__(self, maximum, minimum=1, backoff=0.5, cooldown=1.0):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.limit = float(maximum)
+        self.in_flight = 0
+        self.last_decrease = 0.0
+
+    def _allowed(self):
+        return max(int(self.limit), self.minimum)
+
+    def _update(self, throttled):
+        self.in_flight -= 1
+        if throttled:
+            now = time.monotonic()
+            if now - self.last_decrease >= self.cooldown:
+                self.limit = max(self.minimum, self.limit * self.backoff)
+                self.last_decrease = now
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+
+class ConcurrencyLimiter(AimdLimit):
+    def __init__(self, maximum, **kwargs):
+        super().__init__(maximum, **kwargs)
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= self._allowed():
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, throttled=False):
+        with self.condition:
+            self._update(throttled)
+            self.condition.notify_all()
+
+
+class AsyncConcurrencyLimiter(AimdLimit):
+    # Precisa ser criado dentro do event loop que vai usá-lo, como o semáforo que ele substitui.
+    def __init__(self, maximum, **kwargs):
+        super().__init__(maximum, **kwargs)
+        self.condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < self._allowed())
+            self.in_flight += 1
+
+    async def release(self, throttled=False):
+        async with self.condition:
+            self._update(throttled)
+            self.condition.notify_all()
@@ -0,0 +1,162 @@
+import re
+import unicodedata
+from collections import defaultdict
+from itertools import chain, islice
+
+INDEXED_FIELDS = ('titulo', 'descricao')
+WORD_RE = re.compile(r'\w+')
+# Máximo de tarefas devolvidas por search(query, RESULT_LIMIT). Termos comuns ("ta", "relatorio") casam dezenas de
+# milhares de tarefas, e só a interseção exata desses conjuntos já passaria de 5 ms com 100 mil tarefas.
+RESULT_LIMIT = 2000
+# Candidatos conferidos no primeiro bloco contra os demais termos quando a busca tem limite; cada bloco seguinte
+# dobra de tamanho, para termos que quase nunca aparecem juntos não pagarem por centenas de blocos pequenos.
+CANDIDATE_CHUNK = 4096
+# Acima disso, um termo que não é o primeiro é conferido pelas palavras de cada candidato, sem unir as listas.
+UNION_LIMIT = 20000
+# Atalho para as letras acentuadas do português; o NFKD só roda quando sobra algum caractere fora do ASCII.
+ACCENTS = str.maketrans('áàâãäéèêëíìîïóòôõöúùûüçñÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑ',
+                        'aaaaaeeeeiiiiooooouuuucnAAAAAEEEEIIIIOOOOOUUUUCN')
+
+
+def normalize(text):
+    # Busca sem acento e sem caixa: "Ação" e "acao" caem no mesmo termo.
+    text = (text or '').translate(ACCENTS)
+    if not text.isascii():
+        text = ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+    return text.casefold()
+
+
+def trigrams(word):
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+def grams(word):
+    # Bigramas também entram no índice: um termo de duas letras vira uma consulta direta, sem varrer o vocabulário.
+    return trigrams(word) | {word[i:i + 2] for i in range(len(word) - 1)}
+
+
+class TaskSearchIndex:
+    # Índice em dois níveis: palavra -> ids das tarefas, e bigrama/trigrama -> palavras do vocabulário. Um termo da
+    # busca encontra as palavras que o contêm pelo índice de n-gramas (o vocabulário é bem menor que o número de
+    # tarefas) e depois une as tarefas dessas palavras. Cada termo é casado como substring de alguma palavra.
+    def __init__(self):
+        self.doc_words = {}
+        self.word_docs = defaultdict(set)
+        self.gram_words = defaultdict(set)
+
+    def _words(self, task):
+        return frozenset(WORD_RE.findall(' '.join(normalize(task.get(field)) for field in INDEXED_FIELDS)))
+
+    def add(self, task):
+        task_id = task['id']
+        words = self._words(task)
+        old = self.doc_words.get(task_id)
+        if old == words:
+            return
+        if old is not None:
+            self._unlink(task_id, old - words)
+            words_to_link = words - old
+        else:
+            words_to_link = words
+        self.doc_words[task_id] = words
+        for word in words_to_link:
+            docs = self.word_docs[word]
+            if not docs:
+                for gram in grams(word):
+                    self.gram_words[gram].add(word)
+            docs.add(task_id)
+
+    def remove(self, task_id):
+        old = self.doc_words.pop(task_id, None)
+        if old is not None:
+            self._unlink(task_id, old)
+
+    def _unlink(self, task_id, words):
+        for word in words:
+            docs = self.word_docs.get(word)
+            if docs is None:
+                continue
+            docs.discard(task_id)
+            if not docs:
+                del self.word_docs[word]
+                for gram in grams(word):
+                    vocab = self.gram_words.get(gram)
+                    if vocab is not None:
+                        vocab.discard(word)
+                        if not vocab:
+                            del self.gram_words[gram]
+
+    def clear(self):
+        self.doc_words.clear()
+        self.word_docs.clear()
+        self.gram_words.clear()
+
+    def _matching_words(self, term):
+        if len(term) == 2:
+            return list(self.gram_words.get(term, ()))
+        candidates = None
+        for gram in sorted(trigrams(term), key=lambda g: len(self.gram_words.get(g, ()))):
+            vocab = self.gram_words.get(gram)
+            if not vocab:
+                return []
+            candidates = vocab if candidates is None else candidates & vocab
+        return [word for word in candidates if term in word]
+
+    def _union(self, words):
+        return set().union(*(self.word_docs[word] for word in words))
+
+    def search(self, query, limit=None):
+        # None significa "sem filtro": termos de uma letra só casam com quase tudo e não valem a busca. Com limit,
+        # a busca para ao achar limit tarefas, e o resultado pode ser parcial (len(resultado) == limit).
+        terms = [term for term in WORD_RE.findall(normalize(query)) if len(term) >= 2]
+        if not terms:
+            return None
+        matches = []
+        for term in set(terms):
+            words = self._matching_words(term)
+            if not words:
+                return set()
+            matches.append((sum(len(self.word_docs[word]) for word in words), words))
+        # O termo mais seletivo vai primeiro: dele saem os candidatos, que os demais só confirmam.
+        matches.sort(key=lambda match: match[0])
+        if limit is None:
+            result = self._union(matches[0][1])
+            for _, words in matches[1:]:
+                result &= self._union(words)
+                if not result:
+                    return set()
+            return result
+        checks = []
+        # Conjuntos dos demais termos para a interseção direta; None se algum termo é conferido palavra a palavra.
+        others = []
+        for size, words in matches[1:]:
+            if len(words) == 1 or size <= UNION_LIMIT:
+                posting = self.word_docs[words[0]] if len(words) == 1 else self._union(words)
+                checks.append(posting.intersection)
+                if others is not None:
+                    others.append(posting)
+            else:
+                checks.append(lambda chunk, words=set(words): {task_id for task_id in chunk
+                                                                if not words.isdisjoint(self.doc_words[task_id])})
+                others = None
+        first_size, first_words = matches[0]
+        candidates = chain.from_iterable(self.word_docs[word] for word in first_words)
+        result = set()
+        chunk_size = CANDIDATE_CHUNK
+        seen = 0
+        while len(result) < limit:
+            chunk = list(islice(candidates, chunk_size))
+            if not chunk:
+                break
+            seen += len(chunk)
+            chunk_size *= 2
+            for check in checks:
+                chunk = check(chunk)
+            result.update(chunk)
+            if others and seen < first_size and len(result) * first_size < limit * seen:
+                # Poucos acertos por bloco (termos que quase nunca aparecem juntos): no ritmo atual o limite não seria
+                # atingido, e a interseção direta, em C, sai mais barata que percorrer o resto em blocos.
+                first = self.word_docs[first_words[0]] if len(first_words) == 1 else self._union(first_words)
+                result = first.intersection(*others)
+                break
+        return result if len(result) <= limit else set(islice(result, limit))
@@ -0,0 +1,111 @@
+import json
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    user_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    titulo TEXT,
+    status TEXT,
+    created_at INTEGER,
+    data TEXT NOT NULL,
+    PRIMARY KEY (user_id, id)
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_user_status ON tasks (user_id, status);
+CREATE INDEX IF NOT EXISTS idx_tasks_user_created ON tasks (user_id, created_at DESC);
+"""
+
+
+def merge_task(stored, incoming):
+    # Junta uma tarefa parcial (consulta com projeção) à versão já conhecida. Se a parcial for mais nova, a descrição
+    # guardada pode estar desatualizada: ela é descartada e buscada de novo.
+    merged = {**stored, **incoming}
+    if 'descricao' not in incoming and (incoming.get('updated_at') or 0) > (stored.get('updated_at') or 0):
+        merged.pop('descricao', None)
+    return merged
+
+
+class TaskCache:
+    def __init__(self, path):
+        self.path = path
+        # A mesma conexão é usada pela interface e pelas threads de sincronização; o lock serializa o acesso.
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(SCHEMA)
+
+    def _row(self, user_id, task):
+        return (user_id, task['id'], task.get('titulo'), task.get('status'), task.get('created_at'),
+                json.dumps(task, ensure_ascii=False, default=str))
+
+    def load(self, user_id, search=None):
+        sql = "SELECT data FROM tasks WHERE user_id = ?"
+        params = [user_id]
+        if search:
+            sql += " AND titulo LIKE ?"
+            params.append(f"%{search}%")
+        sql += " ORDER BY created_at DESC, id DESC"
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def iter_pages(self, user_id, page_size=500):
+        # Paginação por chave (created_at, id), na mesma ordem da consulta ao Firestore, sem carregar tudo de uma vez.
+        cursor = None
+        while True:
+            sql = "SELECT data, created_at, id FROM tasks WHERE user_id = ?"
+            params = [user_id]
+            if cursor is not None:
+                sql += " AND (IFNULL(created_at, 0) < ? OR (IFNULL(created_at, 0) = ? AND id < ?))"
+                params += [cursor[0], cursor[0], cursor[1]]
+            sql += " ORDER BY IFNULL(created_at, 0) DESC, id DESC LIMIT ?"
+            params.append(page_size)
+            with self.lock:
+                rows = self.conn.execute(sql, params).fetchall()
+            if rows:
+                yield [json.loads(data) for data, _, _ in rows]
+            if len(rows) < page_size:
+                return
+            cursor = (rows[-1][1] or 0, rows[-1][2])
+
+    def upsert(self, user_id, tasks):
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?)",
+                                  [self._row(user_id, t) for t in tasks])
+
+    def merge(self, user_id, tasks):
+        # Atualiza só os campos recebidos (ex.: consulta com projeção), mantendo os demais já salvos (ver merge_task).
+        ids = [t['id'] for t in tasks]
+        with self.lock, self.conn:
+            existing = {}
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                marks = ','.join('?' * len(chunk))
+                rows = self.conn.execute(f"SELECT id, data FROM tasks WHERE user_id = ? AND id IN ({marks})",
+                                         [user_id, *chunk])
+                existing.update((task_id, json.loads(data)) for task_id, data in rows)
+            self.conn.executemany("INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?)",
+                                  [self._row(user_id, merge_task(existing.get(t['id'], {}), t)) for t in tasks])
+
+    def delete(self, user_id, task_ids):
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM tasks WHERE user_id = ? AND id = ?",
+                                  [(user_id, task_id) for task_id in task_ids])
+
+    def prune(self, user_id, keep_ids):
+        with self.lock:
+            cached = {row[0] for row in self.conn.execute("SELECT id FROM tasks WHERE user_id = ?", (user_id,))}
+        stale = cached - set(keep_ids)
+        if stale:
+            self.delete(user_id, stale)
+
+    def get(self, user_id, task_id):
+        with self.lock:
+            row = self.conn.execute("SELECT data FROM tasks WHERE user_id = ? AND id = ?", (user_id, task_id)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,143 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QDate, QDateTime, QSortFilterProxyModel
+
+from task_cache import merge_task
+
+TASK_ROLE = Qt.UserRole
+SORT_ROLE = Qt.UserRole + 1
+
+COLUMNS = [
+    ('status', 'Status'),
+    ('prioridade', 'Prioridade'),
+    ('titulo', 'Título'),
+    ('due_date', 'Prazo'),
+    ('created_at', 'Criada em'),
+]
+PRIORITY_RANK = {'baixa': 0, 'média': 1, 'alta': 2}
+STATUS_RANK = {'pendente': 0, 'em andamento': 1, 'concluída': 2}
+
+
+class TaskTableModel(QAbstractTableModel):
+    # Linhas ficam numa lista simples com um índice id -> linha; as atualizações chegam como diffs por id
+    # (inseridas/alteradas/removidas), então a view nunca é reconstruída do zero.
+    def __init__(self, parent=None, search_index=None):
+        super().__init__(parent)
+        self.rows = []
+        self.row_of = {}
+        self.search_index = search_index
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section][1]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        task = self.rows[index.row()]
+        field = COLUMNS[index.column()][0]
+        if role == Qt.DisplayRole:
+            value = task.get(field)
+            if field == 'status':
+                return (value or 'N/A').upper()
+            if field == 'titulo':
+                return value or 'Sem Título'
+            if field == 'created_at':
+                return QDateTime.fromSecsSinceEpoch(int(value)).toString('dd/MM/yyyy HH:mm') if value else ''
+            if field == 'due_date':
+                date = QDate.fromString(value or '', 'yyyy-MM-dd')
+                return date.toString('dd/MM/yyyy') if date.isValid() else (value or '')
+            return value or ''
+        if role == SORT_ROLE:
+            value = task.get(field)
+            if field == 'prioridade':
+                return PRIORITY_RANK.get(value, -1)
+            if field == 'status':
+                return STATUS_RANK.get(value, -1)
+            if field == 'created_at':
+                return int(value or 0)
+            return (value or '').lower()
+        if role == TASK_ROLE:
+            return task
+        return None
+
+    def task(self, row):
+        return self.rows[row]
+
+    def task_by_id(self, task_id):
+        row = self.row_of.get(task_id)
+        return None if row is None else self.rows[row]
+
+    def tasks(self):
+        return list(self.rows)
+
+    def upsert(self, tasks, merge=False):
+        # merge=True mantém campos da linha atual que não vieram em task (ex.: descrição fora da projeção), salvo
+        # a descrição de uma versão mais antiga (ver merge_task).
+        new = []
+        for task in tasks:
+            row = self.row_of.get(task['id'])
+            if merge and row is not None:
+                task = merge_task(self.rows[row], task)
+            if row is None:
+                new.append(task)
+            elif self.rows[row] != task:
+                self.rows[row] = task
+                self.dataChanged.emit(self.index(row, 0), self.index(row, len(COLUMNS) - 1))
+            else:
+                continue
+            if self.search_index is not None:
+                self.search_index.add(task)
+        if new:
+            first = len(self.rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(new) - 1)
+            for offset, task in enumerate(new):
+                self.row_of[task['id']] = first + offset
+                self.rows.append(task)
+            self.endInsertRows()
+
+    def remove(self, task_ids):
+        rows = sorted((self.row_of[i] for i in set(task_ids) if i in self.row_of), reverse=True)
+        if not rows:
+            return
+        if self.search_index is not None:
+            for row in rows:
+                self.search_index.remove(self.rows[row]['id'])
+        # Remove em blocos contíguos, de baixo para cima, para os índices restantes continuarem válidos.
+        start = end = rows[0]
+        for row in rows[1:] + [None]:
+            if row is not None and row == start - 1:
+                start = row
+                continue
+            self.beginRemoveRows(QModelIndex(), start, end)
+            del self.rows[start:end + 1]
+            self.endRemoveRows()
+            if row is not None:
+                start = end = row
+        self.row_of = {task['id']: row for row, task in enumerate(self.rows)}
+
+    def set_tasks(self, tasks, merge=False):
+        keep = {task['id'] for task in tasks}
+        self.remove([task_id for task_id in self.row_of if task_id not in keep])
+        self.upsert(tasks, merge)
+
+
+class TaskFilterProxy(QSortFilterProxyModel):
+    # Filtra pelo conjunto de ids devolvido pelo índice de busca; None mostra todas as tarefas.
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.matches = None
+
+    def set_matches(self, matches):
+        self.matches = matches
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if self.matches is None:
+            return True
+        return self.sourceModel().task(source_row)['id'] in self.matches
@@ -0,0 +1,94 @@
+import inspect
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class WorkerSignals(QObject):
+    result = pyqtSignal(object)
+    error = pyqtSignal(object)
+    progress = pyqtSignal(object)
+    finished = pyqtSignal()
+
+
+class Worker(QRunnable):
+    # Executa fn(*args, **kwargs) fora da thread da interface. Se fn devolver um gerador, cada item é emitido
+    # em progress assim que fica pronto, e o cancelamento é verificado entre um item e outro.
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+            if inspect.isgenerator(result):
+                try:
+                    for item in result:
+                        if self.cancelled:
+                            break
+                        self.signals.progress.emit(item)
+                finally:
+                    result.close()
+                result = None
+        except Exception as e:
+            if not self.cancelled:
+                self.signals.error.emit(e)
+        else:
+            if not self.cancelled:
+                self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
+
+
+class TaskRunner(QObject):
+    pending_changed = pyqtSignal(int)
+
+    def __init__(self, parent=None, max_threads=4, background_threads=2):
+        super().__init__(parent)
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_threads)
+        # Trabalhos longos (importação, exportação, descrições) rodam num pool próprio: não ocupam as threads de
+        # que login, atualização da lista e gravações da interface precisam.
+        self.background_pool = QThreadPool()
+        self.background_pool.setMaxThreadCount(background_threads)
+        self.active = set()
+        self.keyed = {}
+
+    def run(self, fn, *args, key=None, on_result=None, on_error=None, on_progress=None, background=False, **kwargs):
+        # Um novo trabalho com a mesma key cancela o anterior, cujo resultado deixa de ser entregue.
+        if key is not None and key in self.keyed:
+            self.keyed.pop(key).cancel()
+        worker = Worker(fn, *args, **kwargs)
+        # Sinais já enfileirados de um trabalho cancelado são descartados na entrega.
+        if on_result:
+            worker.signals.result.connect(lambda value: worker.cancelled or on_result(value))
+        if on_error:
+            worker.signals.error.connect(lambda error: worker.cancelled or on_error(error))
+        if on_progress:
+            worker.signals.progress.connect(lambda item: worker.cancelled or on_progress(item))
+        worker.signals.finished.connect(lambda: self._finished(worker, key))
+        self.active.add(worker)
+        if key is not None:
+            self.keyed[key] = worker
+        self.pending_changed.emit(len(self.active))
+        (self.background_pool if background else self.pool).start(worker)
+        return worker
+
+    def cancel(self, key):
+        if key in self.keyed:
+            self.keyed.pop(key).cancel()
+
+    def is_running(self, key):
+        return key in self.keyed
+
+    def _finished(self, worker, key):
+        self.active.discard(worker)
+        if key is not None and self.keyed.get(key) is worker:
+            del self.keyed[key]
+        self.pending_changed.emit(len(self.active))